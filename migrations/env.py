@@ -36,7 +36,22 @@ target_metadata = current_app.extensions["migrate"].db.metadata
 
 def include_object(object, name, type_, reflected, compare_to):
     # Some tables we don't want to be managed by alembic
-    if type_ == "table" and name in ["spatial_ref_sys", "wards"]:
+    if type_ == "table" and name in [
+        "spatial_ref_sys",
+        "wards",
+        "ward_subdivisions",
+        "ward_simplified",
+    ]:
+        return False
+
+    # Partitions are created (and replaced) by the importer as needed, it's
+    # only the partitioned table itself that's managed by alembic
+    if (
+        type_ == "table"
+        and reflected
+        and compare_to is None
+        and name.startswith("aadf_by_direction_")
+    ):
         return False
 
     return True
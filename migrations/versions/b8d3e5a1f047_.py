@@ -0,0 +1,92 @@
+"""empty message
+
+Revision ID: b8d3e5a1f047
+Revises: f1c9a2d7e305
+Create Date: 2026-10-19 19:12:47.530918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b8d3e5a1f047"
+down_revision = "f1c9a2d7e305"
+branch_labels = None
+depends_on = None
+
+# As used by `import-wards` at the time of writing
+SUBDIVIDE_MAX_VERTICES = 64
+SIMPLIFIED_TOLERANCES = {"medium": 0.0001, "low": 0.001}
+
+
+def upgrade():
+    # Wards loaded with `shp2pgsql` (rather than `flask import-wards`) don't
+    # have the subdivided and simplified geometry the API now relies on, so
+    # build it for them. Like wards, these tables aren't otherwise managed by
+    # alembic, so may or may not already exist.
+    if op.get_bind().execute("SELECT to_regclass('wards')").scalar() is None:
+        return
+
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS wards_geom_idx ON wards USING GIST (geom)"
+    )
+
+    op.execute(
+        "CREATE TABLE IF NOT EXISTS ward_subdivisions ("
+        "id SERIAL PRIMARY KEY, "
+        "ward_gid INTEGER NOT NULL, "
+        "geom geometry(GEOMETRY, 4326))"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_ward_subdivisions_ward_gid "
+        "ON ward_subdivisions (ward_gid)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_ward_subdivisions_geom "
+        "ON ward_subdivisions USING GIST (geom)"
+    )
+    op.execute(
+        "CREATE TABLE IF NOT EXISTS ward_simplified ("
+        "ward_gid INTEGER, "
+        "detail VARCHAR(10), "
+        "geom geometry(MULTIPOLYGON, 4326), "
+        "PRIMARY KEY (ward_gid, detail))"
+    )
+
+    # Only fill them in if `import-wards` hasn't already
+    connection = op.get_bind()
+    if not connection.execute(
+        "SELECT EXISTS (SELECT 1 FROM ward_subdivisions)"
+    ).scalar():
+        connection.execute(
+            sa.text(
+                "INSERT INTO ward_subdivisions (ward_gid, geom) "
+                "SELECT gid, ST_Subdivide(geom, :max_vertices) FROM wards"
+            ),
+            max_vertices=SUBDIVIDE_MAX_VERTICES,
+        )
+
+    if not connection.execute(
+        "SELECT EXISTS (SELECT 1 FROM ward_simplified)"
+    ).scalar():
+        for detail, tolerance in SIMPLIFIED_TOLERANCES.items():
+            connection.execute(
+                sa.text(
+                    "INSERT INTO ward_simplified (ward_gid, detail, geom) "
+                    "SELECT gid, :detail, "
+                    "ST_Multi(ST_SimplifyPreserveTopology(geom, :tolerance)) "
+                    "FROM wards"
+                ),
+                detail=detail,
+                tolerance=tolerance,
+            )
+
+    op.execute("ANALYZE ward_subdivisions")
+    op.execute("ANALYZE ward_simplified")
+
+
+def downgrade():
+    # Nothing to undo: the tables are `import-wards`' to manage, and the API
+    # before this revision doesn't mind them being there.
+    pass
@@ -0,0 +1,150 @@
+"""empty message
+
+Revision ID: f1c9a2d7e305
+Revises: e4b71c0f92da
+Create Date: 2026-10-19 17:05:33.201846
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "f1c9a2d7e305"
+down_revision = "e4b71c0f92da"
+branch_labels = None
+depends_on = None
+
+INDEXED_COLUMNS = [
+    "count_point_id",
+    "direction_of_travel",
+    "estimation_method",
+    "estimation_method_detailed",
+    "local_authority_id",
+    "local_authority_name",
+    "point",
+    "region_id",
+    "region_name",
+    "road_name",
+    "road_type",
+    "year",
+]
+
+
+def create_indexes(table):
+    for column in INDEXED_COLUMNS:
+        op.create_index(
+            f"ix_aadf_by_direction_{column}", table, [column], unique=False
+        )
+
+
+def drop_indexes(table):
+    for column in INDEXED_COLUMNS:
+        op.drop_index(f"ix_aadf_by_direction_{column}", table_name=table)
+
+
+def upgrade():
+    # Partitioned indexes, primary keys and default partitions need 11
+    version = op.get_bind().execute("SHOW server_version_num").scalar()
+    if int(version) < 110000:
+        raise RuntimeError(
+            "Partitioning aadf_by_direction needs PostgreSQL 11"
+        )
+
+    # Move the existing table out of the way, freeing up its index names
+    op.rename_table("aadf_by_direction", "aadf_by_direction_unpartitioned")
+    op.execute(
+        "ALTER INDEX aadf_by_direction_pkey "
+        "RENAME TO aadf_by_direction_unpartitioned_pkey"
+    )
+    drop_indexes("aadf_by_direction_unpartitioned")
+    # GiST index created by GeoAlchemy along with the original table
+    op.execute("DROP INDEX IF EXISTS idx_aadf_by_direction_point")
+
+    # Same columns (and ID sequence) as before. Primary keys of partitioned
+    # tables have to include the partition key.
+    op.execute(
+        "CREATE TABLE aadf_by_direction "
+        "(LIKE aadf_by_direction_unpartitioned INCLUDING DEFAULTS) "
+        "PARTITION BY LIST (local_authority_id)"
+    )
+    op.create_primary_key(
+        "aadf_by_direction_pkey",
+        "aadf_by_direction",
+        ["id", "local_authority_id"],
+    )
+    op.execute(
+        "ALTER SEQUENCE aadf_by_direction_id_seq "
+        "OWNED BY aadf_by_direction.id"
+    )
+
+    # A partition per local authority already imported. Later ones are created
+    # as they're imported.
+    op.execute(
+        "CREATE TABLE aadf_by_direction_default "
+        "PARTITION OF aadf_by_direction DEFAULT"
+    )
+    local_authority_ids = [
+        row[0]
+        for row in op.get_bind().execute(
+            "SELECT DISTINCT local_authority_id "
+            "FROM aadf_by_direction_unpartitioned"
+        )
+    ]
+    for local_authority_id in local_authority_ids:
+        op.execute(
+            f"CREATE TABLE aadf_by_direction_la_{local_authority_id} "
+            "PARTITION OF aadf_by_direction "
+            f"FOR VALUES IN ({local_authority_id})"
+        )
+
+    op.execute(
+        "INSERT INTO aadf_by_direction "
+        "SELECT * FROM aadf_by_direction_unpartitioned"
+    )
+
+    # Indexes on the partitioned table are created on every partition, and
+    # any added later
+    create_indexes("aadf_by_direction")
+    op.create_index(
+        "idx_aadf_by_direction_point",
+        "aadf_by_direction",
+        ["point"],
+        postgresql_using="gist",
+    )
+
+    op.drop_table("aadf_by_direction_unpartitioned")
+    op.execute("ANALYZE aadf_by_direction")
+
+
+def downgrade():
+    op.execute(
+        "CREATE TABLE aadf_by_direction_unpartitioned "
+        "(LIKE aadf_by_direction INCLUDING DEFAULTS)"
+    )
+    op.execute(
+        "INSERT INTO aadf_by_direction_unpartitioned "
+        "SELECT * FROM aadf_by_direction"
+    )
+    op.execute(
+        "ALTER SEQUENCE aadf_by_direction_id_seq "
+        "OWNED BY aadf_by_direction_unpartitioned.id"
+    )
+
+    op.drop_index(
+        "idx_aadf_by_direction_point", table_name="aadf_by_direction"
+    )
+    # Drops every partition too
+    op.drop_table("aadf_by_direction")
+
+    op.rename_table("aadf_by_direction_unpartitioned", "aadf_by_direction")
+    op.create_primary_key(
+        "aadf_by_direction_pkey", "aadf_by_direction", ["id"]
+    )
+    create_indexes("aadf_by_direction")
+    op.create_index(
+        "idx_aadf_by_direction_point",
+        "aadf_by_direction",
+        ["point"],
+        postgresql_using="gist",
+    )
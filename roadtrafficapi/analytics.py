@@ -0,0 +1,321 @@
+"""
+Analytics over a columnar snapshot of the AADF By Direction data.
+
+Aggregating across the whole country row by row through SQLAlchemy is slow,
+and ties up the database while doing it. Instead, `export_snapshot` writes the
+data out as Arrow IPC files, one per year, which are memory mapped (so shared
+between gunicorn workers) and crunched with vectorised NumPy operations.
+
+Arrow IPC rather than Parquet, as it can be memory mapped and used without
+decoding or copying anything.
+
+Snapshot layout:
+
+    <ANALYTICS_SNAPSHOT_PATH>/
+        CURRENT                      <- name of the current snapshot
+        <snapshot>/year=<year>.arrow
+"""
+
+import os
+import shutil
+import threading
+import time
+import uuid
+
+# Columns included in the snapshot
+COLUMNS = [
+    "count_point_id",
+    "year",
+    "region_id",
+    "local_authority_id",
+    "road_name",
+    "road_type",
+    "direction_of_travel",
+    "link_length_km",
+    "pedal_cycles",
+    "two_wheeled_motor_vehicles",
+    "cars_and_taxis",
+    "buses_and_coaches",
+    "lgvs",
+    "all_hgvs",
+    "all_motor_vehicles",
+]
+
+VEHICLE_COLUMNS = [
+    "pedal_cycles",
+    "two_wheeled_motor_vehicles",
+    "cars_and_taxis",
+    "buses_and_coaches",
+    "lgvs",
+    "all_hgvs",
+    "all_motor_vehicles",
+]
+
+# How many old snapshots to keep around, in case a worker is still using them
+KEEP_SNAPSHOTS = 2
+
+
+def export_snapshot(path, session):
+    """
+    Write a new snapshot of all AADF By Direction data to `path`, then make
+    it the current one and bump the `analytics` version, so cached responses
+    from the previous snapshot are let go.
+    """
+    import pyarrow as pa
+
+    from .models import AADFByDirection
+    from .versions import bump_dataset_version
+
+    # Timestamped so they sort in the order they were exported, and unique
+    # even if two are exported in the same second
+    name = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    snapshot_path = os.path.join(path, name)
+    os.makedirs(snapshot_path)
+
+    q = (
+        session.query(*[getattr(AADFByDirection, c) for c in COLUMNS])
+        .order_by(AADFByDirection.year)
+        .execution_options(stream_results=True)
+        .yield_per(10000)
+    )
+
+    def write(year, rows):
+        columns = {c: list(values) for c, values in zip(COLUMNS, zip(*rows))}
+        columns["year"] = [int(year)] * len(rows)
+        columns["link_length_km"] = [
+            float(v) if v is not None else None
+            for v in columns["link_length_km"]
+        ]
+        table = pa.Table.from_pydict(columns)
+
+        with pa.OSFile(
+            os.path.join(snapshot_path, f"year={year}.arrow"), "wb"
+        ) as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    # Rows come out ordered by year, so can write each year as soon as the
+    # next starts.
+    year, rows = None, []
+    for row in q:
+        if row.year != year and rows:
+            write(year, rows)
+            rows = []
+        year = row.year
+        rows.append(row)
+    if rows:
+        write(year, rows)
+
+    # Switch over atomically, so readers never see a half written snapshot
+    current = os.path.join(path, "CURRENT")
+    with open(f"{current}.tmp", "w") as f:
+        f.write(name)
+    os.replace(f"{current}.tmp", current)
+
+    bump_dataset_version("analytics", 0, session)
+    session.commit()
+
+    old = sorted(
+        entry
+        for entry in os.listdir(path)
+        if os.path.isdir(os.path.join(path, entry))
+    )[:-KEEP_SNAPSHOTS]
+    for entry in old:
+        shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+
+    return snapshot_path
+
+
+def to_numpy(column):
+    """
+    Arrow column as a NumPy array. Numeric columns are zero copy, i.e. read
+    straight from the memory mapped file.
+    """
+    import numpy as np
+
+    # Only copies when it has to, e.g. for strings or nulls, which is why
+    # snapshots convert every column once when loaded rather than per request
+    arrays = [chunk.to_numpy(zero_copy_only=False) for chunk in column.chunks]
+    if len(arrays) == 1:
+        return arrays[0]
+    return np.concatenate(arrays)
+
+
+class Snapshot:
+    """
+    A memory mapped snapshot, with one Arrow table per year.
+    """
+
+    def __init__(self, path):
+        import pyarrow as pa
+
+        self.path = path
+        self.tables = {}
+        self.columns = {}
+        for entry in sorted(os.listdir(path)):
+            if not entry.startswith("year=") or not entry.endswith(".arrow"):
+                continue
+            year = int(entry[len("year=") : -len(".arrow")])
+            source = pa.memory_map(os.path.join(path, entry))
+            self.tables[year] = pa.ipc.open_file(source).read_all()
+            self.columns[year] = {
+                name: to_numpy(self.tables[year].column(name))
+                for name in self.tables[year].column_names
+            }
+
+    @property
+    def years(self):
+        return sorted(self.tables)
+
+    def column(self, year, name):
+        """
+        Column as a NumPy array, see `to_numpy`.
+        """
+        return self.columns[year][name]
+
+    def mask(self, year, **filters):
+        """
+        Boolean mask of rows matching all `filters` (column name to value).
+        """
+        import numpy as np
+
+        mask = np.ones(self.tables[year].num_rows, dtype=bool)
+        for name, value in filters.items():
+            if value is not None:
+                mask &= self.column(year, name) == value
+        return mask
+
+
+class Analytics:
+    """
+    Serves analytics from the current snapshot.
+
+    Disabled unless `ANALYTICS_SNAPSHOT_PATH` is configured and a snapshot has
+    been exported.
+    """
+
+    def __init__(self, app=None):
+        self.path = None
+        self._snapshot = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("ANALYTICS_SNAPSHOT_PATH", None)
+        self.path = app.config["ANALYTICS_SNAPSHOT_PATH"]
+
+    @property
+    def enabled(self):
+        return self.path is not None and os.path.exists(
+            os.path.join(self.path, "CURRENT")
+        )
+
+    def export(self):
+        from . import db
+
+        return export_snapshot(self.path, db.session)
+
+    @property
+    def snapshot(self):
+        """
+        The current snapshot, switching to a newer one if it's been exported
+        since last used.
+        """
+        with open(os.path.join(self.path, "CURRENT")) as f:
+            path = os.path.join(self.path, f.read().strip())
+
+        with self._lock:
+            if self._snapshot is None or self._snapshot.path != path:
+                self._snapshot = Snapshot(path)
+            return self._snapshot
+
+    def hgv_share(
+        self, region_id=None, local_authority_id=None, road_type=None
+    ):
+        """
+        Share of motor vehicles which are HGVs, per year.
+        """
+        snapshot = self.snapshot
+
+        out = []
+        for year in snapshot.years:
+            mask = snapshot.mask(
+                year,
+                region_id=region_id,
+                local_authority_id=local_authority_id,
+                road_type=road_type,
+            )
+            hgvs = int(snapshot.column(year, "all_hgvs")[mask].sum())
+            motor_vehicles = int(
+                snapshot.column(year, "all_motor_vehicles")[mask].sum()
+            )
+            out.append(
+                {
+                    "year": year,
+                    "all_hgvs": hgvs,
+                    "all_motor_vehicles": motor_vehicles,
+                    "hgv_share": hgvs / motor_vehicles
+                    if motor_vehicles
+                    else None,
+                }
+            )
+
+        return out
+
+    def road_ranking(
+        self,
+        year,
+        vehicle="all_motor_vehicles",
+        region_id=None,
+        local_authority_id=None,
+        road_type=None,
+    ):
+        """
+        Count points ranked by traffic (both directions combined), busiest
+        first, with the percentile each falls in.
+        """
+        import numpy as np
+
+        snapshot = self.snapshot
+        if year not in snapshot.tables:
+            return []
+
+        mask = snapshot.mask(
+            year,
+            region_id=region_id,
+            local_authority_id=local_authority_id,
+            road_type=road_type,
+        )
+        count_point_ids = snapshot.column(year, "count_point_id")[mask]
+        if not len(count_point_ids):
+            return []
+
+        # Sum directions per count point
+        ids, first, inverse = np.unique(
+            count_point_ids, return_index=True, return_inverse=True
+        )
+        totals = np.bincount(
+            inverse, weights=snapshot.column(year, vehicle)[mask]
+        )
+
+        order = np.argsort(-totals, kind="stable")
+        # Percentage of (other) count points with less traffic than each one
+        less = np.searchsorted(np.sort(totals), totals, side="left")
+        percentiles = less / max(len(totals) - 1, 1) * 100
+
+        road_names = snapshot.column(year, "road_name")[mask][first]
+        local_authority_ids = snapshot.column(year, "local_authority_id")[
+            mask
+        ][first]
+
+        return [
+            {
+                "count_point_id": int(ids[i]),
+                "road_name": road_names[i],
+                "local_authority_id": int(local_authority_ids[i]),
+                vehicle: int(totals[i]),
+                "percentile": float(percentiles[i]),
+            }
+            for i in order
+        ]
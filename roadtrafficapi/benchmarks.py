@@ -0,0 +1,75 @@
+"""
+Rough benchmarks, run from the CLI against a real database.
+"""
+
+import random
+import time
+
+from . import db, spatial_index
+from .models import AADFByDirection
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def summarise(name, timings):
+    timings = [t * 1000 for t in timings]
+    return (
+        f"{name:>8}: mean {sum(timings) / len(timings):.3f}ms, "
+        f"p50 {percentile(timings, 50):.3f}ms, "
+        f"p95 {percentile(timings, 95):.3f}ms, "
+        f"max {max(timings):.3f}ms"
+    )
+
+
+def benchmark_spatial_index(queries, distance, seed=None):
+    """
+    Time radius searches around random count points, using both the spatial
+    index and PostGIS, and check they agree.
+
+    Yields lines of the report.
+    """
+    rng = random.Random(seed)
+    index = spatial_index.index
+    if not index.count:
+        yield "Spatial index is empty"
+        return
+
+    index_timings = []
+    postgis_timings = []
+    mismatches = 0
+
+    for _ in range(queries):
+        # Search around (roughly) a count point, so there's always something
+        # to find.
+        i = rng.randrange(index.count)
+        longitude = index.longitudes[i] + rng.uniform(-0.01, 0.01)
+        latitude = index.latitudes[i] + rng.uniform(-0.01, 0.01)
+
+        start = time.perf_counter()
+        from_index = set(spatial_index.radius(longitude, latitude, distance))
+        index_timings.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        q = (
+            db.session.query(AADFByDirection.count_point_id)
+            .filter(
+                AADFByDirection.point.ST_Distance_Sphere(
+                    f"SRID=4326;POINT({longitude} {latitude})"
+                )
+                <= distance
+            )
+            .distinct()
+        )
+        from_postgis = {count_point_id for count_point_id, in q}
+        postgis_timings.append(time.perf_counter() - start)
+
+        if from_index != from_postgis:
+            mismatches += 1
+
+    yield f"{queries} radius searches of {distance:.0f}m"
+    yield summarise("index", index_timings)
+    yield summarise("postgis", postgis_timings)
+    yield f"Results differed for {mismatches} searches"
@@ -0,0 +1,160 @@
+"""
+Cache of compressed response bodies.
+
+Data only changes on import, so there's no point re-running queries and
+re-compressing the same few MB of JSON for every request. Compressed bodies
+are cached per URL, query string, dataset version and encoding, so repeat
+requests are served straight from memory.
+"""
+
+import gzip
+import importlib.util
+from functools import lru_cache
+
+from flask import Response, g, request
+
+from .cache import LRUCache
+
+
+@lru_cache(maxsize=None)
+def installed(module):
+    """
+    Whether an optional module is installed, without importing it.
+
+    brotli and zstandard are faster/smaller alternatives to gzip. They're only
+    offered to clients if installed, and only imported once first used.
+    """
+    return importlib.util.find_spec(module) is not None
+
+
+class CompressionCache:
+    """
+    `version` is called to get the current dataset version, which forms part
+    of the cache key so entries naturally stop being used after an import.
+    """
+
+    def __init__(self, app=None, version=None):
+        self.version = version
+        self.cache = None
+        self._exempt = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("COMPRESSION_CACHE_ENABLED", True)
+        app.config.setdefault("COMPRESSION_CACHE_SIZE", 64 * 1024 * 1024)
+        app.config.setdefault("COMPRESSION_CACHE_MIN_SIZE", 500)
+        app.config.setdefault("COMPRESSION_GZIP_LEVEL", 6)
+        app.config.setdefault("COMPRESSION_BROTLI_QUALITY", 9)
+        app.config.setdefault("COMPRESSION_ZSTD_LEVEL", 10)
+
+        if not app.config["COMPRESSION_CACHE_ENABLED"]:
+            return
+
+        self.cache = LRUCache(
+            app.config["COMPRESSION_CACHE_SIZE"],
+            sizeof=lambda entry: len(entry[0]),
+        )
+        self.config = app.config
+
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+
+    def exempt(self, view):
+        """
+        Decorator for views whose responses mustn't be cached, e.g. because
+        they change without the dataset version changing.
+        """
+        self._exempt.add(view.__name__)
+        return view
+
+    @property
+    def encodings(self):
+        """
+        Supported encodings, in order of preference.
+        """
+        encodings = []
+        if installed("brotli"):
+            encodings.append("br")
+        if installed("zstandard"):
+            encodings.append("zstd")
+        encodings.append("gzip")
+        return encodings
+
+    def compress(self, data, encoding):
+        if encoding == "br":
+            import brotli
+
+            return brotli.compress(
+                data, quality=self.config["COMPRESSION_BROTLI_QUALITY"]
+            )
+        if encoding == "zstd":
+            import zstandard
+
+            return zstandard.ZstdCompressor(
+                level=self.config["COMPRESSION_ZSTD_LEVEL"]
+            ).compress(data)
+        if encoding == "gzip":
+            return gzip.compress(
+                data, compresslevel=self.config["COMPRESSION_GZIP_LEVEL"]
+            )
+        return data
+
+    def negotiate(self):
+        """
+        Encoding to use for the current request's response.
+        """
+        return (
+            request.accept_encodings.best_match(self.encodings) or "identity"
+        )
+
+    def cache_key(self, encoding):
+        args = tuple(sorted(request.args.items(multi=True)))
+        return (request.path, args, self.version(), encoding)
+
+    def before_request(self):
+        if request.method != "GET" or request.endpoint in self._exempt:
+            return None
+
+        g.compression_cache_key = key = self.cache_key(self.negotiate())
+
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+
+        body, mimetype, encoding = entry
+        g.compression_cache_hit = True
+        response = Response(body, mimetype=mimetype)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        return response
+
+    def after_request(self, response):
+        key = g.get("compression_cache_key")
+        if (
+            key is None
+            or g.get("compression_cache_hit")
+            or response.status_code != 200
+            or response.mimetype != "application/json"
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+
+        data = response.get_data()
+        encoding = key[-1]
+        if len(data) < self.config["COMPRESSION_CACHE_MIN_SIZE"]:
+            encoding = "identity"
+        else:
+            data = self.compress(data, encoding)
+
+        # Cache under the key for the originally requested encoding, even if
+        # the body was too small to bother compressing.
+        self.cache.set(key, (data, response.mimetype, encoding))
+
+        response.set_data(data)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        return response
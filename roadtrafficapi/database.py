@@ -0,0 +1,52 @@
+"""
+Routes read only requests to read replicas, leaving the primary for imports.
+"""
+
+import random
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy import SignallingSession, SQLAlchemy, get_state
+from sqlalchemy import orm
+from sqlalchemy.sql.dml import UpdateBase
+
+READ_ONLY_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class RoutingSession(SignallingSession):
+    """
+    Session which sends everything done during read only requests (GET etc)
+    to one of the configured read replicas.
+
+    Anything outside of a request (CLI commands, imports, migrations), or
+    which writes, goes to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None):
+        replica = self._replica(clause)
+        if replica is not None:
+            state = get_state(self.app)
+            return state.db.get_engine(self.app, bind=replica)
+
+        return super().get_bind(mapper, clause)
+
+    def _replica(self, clause):
+        replicas = self.app.config.get("DATABASE_REPLICAS")
+        if (
+            not replicas
+            or self._flushing
+            or isinstance(clause, UpdateBase)
+            or not has_request_context()
+            or request.method not in READ_ONLY_METHODS
+        ):
+            return None
+
+        # Stick to the same replica for the whole request, so e.g. pagination
+        # counts and results come from the same place.
+        if "database_replica" not in g:
+            g.database_replica = random.choice(replicas)
+        return g.database_replica
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
@@ -0,0 +1,274 @@
+"""
+Registry of the DfT datasets which can be imported.
+
+Each dataset declares its model, where to download each local authority's CSV
+from, and how CSV columns map onto model columns. Everything else (streaming,
+parsing, validation and loading with COPY) is shared, see
+`importers.import_dataset`.
+
+Parsing and validation of each column is worked out from the model column
+itself: its type, whether it's nullable and (for strings) its maximum length.
+"""
+
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import Date, Float, Integer, Numeric, String
+
+from .models import AADF, AADFByDirection, RawCount
+
+DATASETS = {}
+
+# DfT's per local authority downloads, by dataset
+DOWNLOAD_URL = "https://dft-statistics.s3.amazonaws.com/road-traffic/downloads/{path}/local_authority_id/dft_{prefix}_local_authority_id_{local_authority_id}.csv"
+
+
+def parse_integer(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError("Not a valid integer.")
+
+
+def parse_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError("Not a valid number.")
+
+
+def parse_decimal(value):
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError("Not a valid number.")
+
+
+def parse_date(value):
+    # Dates sometimes come with a (midnight) time, e.g. "2018-06-22 00:00:00"
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        raise ValueError("Not a valid date.")
+
+
+# Checked in order, so subclasses (e.g. Numeric's Float) must come first
+PARSERS = [
+    (Float, parse_float),
+    (Numeric, parse_decimal),
+    (Integer, parse_integer),
+    (Date, parse_date),
+    (String, str),
+]
+
+
+class Field:
+    """
+    A model column, filled from a CSV column.
+    """
+
+    def __init__(self, column, source):
+        self.name = column.name
+        self.source = source
+        self.required = not column.nullable
+        self.max_length = getattr(column.type, "length", None)
+        self.parse = next(
+            parse for type_, parse in PARSERS if isinstance(column.type, type_)
+        )
+
+    def load(self, value):
+        """
+        Parsed value, raising `ValueError` (with a message suitable for the
+        rejects file) if it's not valid.
+        """
+        value = value.strip() if value is not None else ""
+        if value == "":
+            if self.required:
+                raise ValueError("Missing data for required field.")
+            return None
+
+        value = self.parse(value)
+        if self.max_length is not None and len(value) > self.max_length:
+            raise ValueError(f"Longer than maximum length {self.max_length}.")
+        return value
+
+
+class Dataset:
+    """
+    A DfT dataset, imported a local authority at a time.
+
+    By default every column of `model` (other than `generated` ones, which
+    the database fills in) is filled from the CSV column with the same name.
+    `columns` overrides the CSV column name for any which differ, and
+    `derived` maps column names to functions which work out their value from
+    the rest of the (parsed) row instead.
+
+    Rows are partitioned by `partition_by`: each import replaces all rows with
+    the same value, and bumps the version of just that partition. If the
+    table is `partitioned` (by LIST of `partition_by`) in PostgreSQL too,
+    imports load a new table and swap it in as the partition, rather than
+    deleting and inserting rows.
+
+    `after_commit`, if given, is called with the session once an import has
+    been committed, to rebuild anything derived from the whole dataset. It's
+    called holding the dataset wide lock (so one import at a time, each
+    seeing the others' committed rows) and anything it adds to the session is
+    committed afterwards.
+    """
+
+    partition_by = "local_authority_id"
+    generated = ("id",)
+
+    def __init__(
+        self,
+        name,
+        model,
+        url,
+        columns=None,
+        derived=None,
+        partitioned=False,
+        after_commit=None,
+    ):
+        self.name = name
+        self.model = model
+        self.url = url
+        self.derived = derived or {}
+        self.partitioned = partitioned
+        self.after_commit = after_commit
+
+        columns = columns or {}
+        self.fields = [
+            Field(column, columns.get(column.name, column.name))
+            for column in self.table.columns
+            if column.name not in self.generated
+            and column.name not in self.derived
+        ]
+
+    @property
+    def table(self):
+        return self.model.__table__
+
+    @property
+    def column_names(self):
+        """
+        Names of the columns loaded, in the order `parse_row` returns them.
+        """
+        return [field.name for field in self.fields] + list(self.derived)
+
+    def partition_name(self, local_authority_id):
+        """
+        Name of the table holding a local authority's rows, if `partitioned`.
+        """
+        return f"{self.table.name}_la_{int(local_authority_id)}"
+
+    def download_url(self, local_authority_id):
+        return self.url.format(local_authority_id=local_authority_id)
+
+    def missing_columns(self, header):
+        """
+        Required CSV columns missing from `header`.
+        """
+        return [
+            field.source
+            for field in self.fields
+            if field.required and field.source not in header
+        ]
+
+    def parse_row(self, row, local_authority_id):
+        """
+        Tuple of values for `column_names` from a CSV row.
+
+        Raises `ValueError` with a dict of errors per column (in the same form
+        as Marshmallow's) if the row isn't valid.
+        """
+        values = {}
+        errors = {}
+        for field in self.fields:
+            try:
+                values[field.name] = field.load(row.get(field.source))
+            except ValueError as e:
+                errors[field.name] = [str(e)]
+
+        partition = values.get(self.partition_by)
+        if partition is not None and partition != local_authority_id:
+            errors[self.partition_by] = [
+                f"Expected {local_authority_id}, the local authority being "
+                "imported."
+            ]
+
+        if errors:
+            raise ValueError(errors)
+
+        for name, derive in self.derived.items():
+            values[name] = derive(values)
+
+        return tuple(values[name] for name in self.column_names)
+
+
+def register(dataset):
+    DATASETS[dataset.name] = dataset
+    return dataset
+
+
+def point(values):
+    """
+    Point (as EWKT, which PostGIS accepts as-is) from a row's longitude and
+    latitude.
+    """
+    if values["longitude"] is None or values["latitude"] is None:
+        return None
+    return f"SRID=4326;POINT({values['longitude']} {values['latitude']})"
+
+
+def rebuild_spatial_index(session):
+    from . import spatial_index
+    from .versions import bump_dataset_version
+
+    # Count points may have been added, moved or removed
+    if spatial_index.path:
+        spatial_index.rebuild()
+        # Results found with the old index were cached against the new data's
+        # version in the meantime
+        bump_dataset_version("spatial_index", 0, session)
+
+
+register(
+    Dataset(
+        "aadf_by_direction",
+        AADFByDirection,
+        DOWNLOAD_URL.format(
+            path="aadfbydirection",
+            prefix="aadfbydirection",
+            local_authority_id="{local_authority_id}",
+        ),
+        derived={"point": point},
+        partitioned=True,
+        after_commit=rebuild_spatial_index,
+    )
+)
+
+register(
+    Dataset(
+        "aadf",
+        AADF,
+        DOWNLOAD_URL.format(
+            path="aadf",
+            prefix="aadf",
+            local_authority_id="{local_authority_id}",
+        ),
+        derived={"point": point},
+    )
+)
+
+register(
+    Dataset(
+        "raw_counts",
+        RawCount,
+        DOWNLOAD_URL.format(
+            path="rawcount",
+            prefix="rawcount",
+            local_authority_id="{local_authority_id}",
+        ),
+        derived={"point": point},
+    )
+)
@@ -0,0 +1,48 @@
+import functools
+import threading
+
+from flask_apispec import FlaskApiSpec
+from flask_apispec.apidoc import ResourceConverter, ViewConverter
+from flask_apispec.extension import make_apispec
+
+
+class LazyFlaskApiSpec(FlaskApiSpec):
+    """
+    FlaskApiSpec which only generates the OpenAPI spec the first time it's
+    requested.
+
+    Vanilla FlaskApiSpec builds the spec as soon as views are registered,
+    i.e. every time the app is imported, including for CLI commands and every
+    new gunicorn worker; even though hardly anyone ever looks at the docs.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        super().__init__(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.add_swagger_routes()
+
+    def _defer(self, callable, *args, **kwargs):
+        self._deferred.append(functools.partial(callable, *args, **kwargs))
+
+    def swagger_json(self):
+        with self._lock:
+            if self.spec is None:
+                self._build_spec()
+
+        return super().swagger_json()
+
+    def _build_spec(self):
+        spec = make_apispec(
+            self.app.config.get("APISPEC_TITLE", "flask-apispec"),
+            self.app.config.get("APISPEC_VERSION", "v1"),
+            self.app.config.get("APISPEC_OAS_VERSION", "2.0"),
+        )
+        self.resource_converter = ResourceConverter(self.app, spec=spec)
+        self.view_converter = ViewConverter(app=self.app, spec=spec)
+
+        self.spec = spec
+        for deferred in self._deferred:
+            deferred()
@@ -0,0 +1,114 @@
+"""
+Conversions between longitude/latitude and British National Grid (BNG)
+eastings/northings.
+
+Uses the transverse Mercator formulae from Ordnance Survey's "A guide to
+coordinate systems in Great Britain" on the Airy 1830 ellipsoid. The datum
+shift between WGS84 and OSGB36 is deliberately skipped, so results can be out
+by up to ~120m. That's plenty for generating data and pruning spatial
+searches, but don't use these for anything that needs survey accuracy.
+"""
+
+from math import cos, degrees, radians, sin, sqrt, tan
+
+# Airy 1830 ellipsoid
+A = 6377563.396
+B = 6356256.909
+E2 = 1 - (B * B) / (A * A)
+N = (A - B) / (A + B)
+
+# National Grid projection
+F0 = 0.9996012717
+LAT0 = radians(49)
+LON0 = radians(-2)
+E0 = 400000
+N0 = -100000
+
+
+def _meridional_arc(lat):
+    n2 = N * N
+    n3 = n2 * N
+    return (
+        B
+        * F0
+        * (
+            (1 + N + (5 / 4) * n2 + (5 / 4) * n3) * (lat - LAT0)
+            - (3 * N + 3 * n2 + (21 / 8) * n3)
+            * sin(lat - LAT0)
+            * cos(lat + LAT0)
+            + ((15 / 8) * n2 + (15 / 8) * n3)
+            * sin(2 * (lat - LAT0))
+            * cos(2 * (lat + LAT0))
+            - (35 / 24) * n3 * sin(3 * (lat - LAT0)) * cos(3 * (lat + LAT0))
+        )
+    )
+
+
+def _radii(lat):
+    s = 1 - E2 * sin(lat) ** 2
+    nu = A * F0 / sqrt(s)
+    rho = A * F0 * (1 - E2) / s ** 1.5
+    return nu, rho, nu / rho - 1
+
+
+def lonlat_to_bng(longitude, latitude):
+    """
+    Convert a longitude/latitude (degrees) to an (easting, northing) tuple.
+    """
+    lat = radians(latitude)
+    dlon = radians(longitude) - LON0
+
+    nu, rho, eta2 = _radii(lat)
+    t2 = tan(lat) ** 2
+
+    i = _meridional_arc(lat) + N0
+    ii = nu / 2 * sin(lat) * cos(lat)
+    iii = nu / 24 * sin(lat) * cos(lat) ** 3 * (5 - t2 + 9 * eta2)
+    iiia = nu / 720 * sin(lat) * cos(lat) ** 5 * (61 - 58 * t2 + t2 * t2)
+    iv = nu * cos(lat)
+    v = nu / 6 * cos(lat) ** 3 * (nu / rho - t2)
+    vi = (
+        nu
+        / 120
+        * cos(lat) ** 5
+        * (5 - 18 * t2 + t2 * t2 + 14 * eta2 - 58 * t2 * eta2)
+    )
+
+    northing = i + ii * dlon ** 2 + iii * dlon ** 4 + iiia * dlon ** 6
+    easting = E0 + iv * dlon + v * dlon ** 3 + vi * dlon ** 5
+
+    return easting, northing
+
+
+def bng_to_lonlat(easting, northing):
+    """
+    Convert an easting/northing to a (longitude, latitude) tuple in degrees.
+    """
+    lat = (northing - N0) / (A * F0) + LAT0
+    m = _meridional_arc(lat)
+    while abs(northing - N0 - m) >= 0.00001:
+        lat += (northing - N0 - m) / (A * F0)
+        m = _meridional_arc(lat)
+
+    nu, rho, eta2 = _radii(lat)
+    t = tan(lat)
+    t2 = t * t
+    sec = 1 / cos(lat)
+
+    vii = t / (2 * rho * nu)
+    viii = t / (24 * rho * nu ** 3) * (5 + 3 * t2 + eta2 - 9 * t2 * eta2)
+    ix = t / (720 * rho * nu ** 5) * (61 + 90 * t2 + 45 * t2 * t2)
+    x = sec / nu
+    xi = sec / (6 * nu ** 3) * (nu / rho + 2 * t2)
+    xii = sec / (120 * nu ** 5) * (5 + 28 * t2 + 24 * t2 * t2)
+    xiia = (
+        sec
+        / (5040 * nu ** 7)
+        * (61 + 662 * t2 + 1320 * t2 * t2 + 720 * t2 * t2 * t2)
+    )
+
+    de = easting - E0
+    latitude = lat - vii * de ** 2 + viii * de ** 4 - ix * de ** 6
+    longitude = LON0 + x * de - xi * de ** 3 + xii * de ** 5 - xiia * de ** 7
+
+    return degrees(longitude), degrees(latitude)
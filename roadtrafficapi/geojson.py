@@ -0,0 +1,61 @@
+"""
+GeoJSON output, generated by PostGIS.
+
+Each feature is built as JSON text by the database (`ST_AsGeoJSON` for the
+geometry, `to_jsonb` of the row for the properties), then streamed out as-is.
+Nothing is parsed or rebuilt in Python, so there's no WKB to WKT conversion
+with shapely, and clients get geometry they can use directly.
+"""
+
+import json
+
+from sqlalchemy import JSON, Text, cast, func, literal_column
+
+MIMETYPE = "application/geo+json"
+
+# Decimal places for coordinates unless asked otherwise (roughly 10cm)
+DEFAULT_PRECISION = 6
+
+
+def feature(table, id_column, geom, precision, exclude=()):
+    """
+    SQL expression building a GeoJSON Feature, as text, for each row of
+    `table`.
+
+    Properties are all of the row's columns except those in `exclude` (which
+    should include the geometry column itself).
+    """
+    properties = func.to_jsonb(literal_column(table.name))
+    for column in exclude:
+        properties = properties.op("-")(column)
+
+    return cast(
+        func.json_build_object(
+            "type",
+            "Feature",
+            "id",
+            id_column,
+            "geometry",
+            cast(func.ST_AsGeoJSON(geom, precision), JSON),
+            "properties",
+            properties,
+        ),
+        Text,
+    )
+
+
+def feature_collection(features, **members):
+    """
+    Stream a FeatureCollection, from an iterable of features already
+    serialised as JSON text (see `feature`).
+
+    Any keyword arguments (e.g. pagination `meta`) are added as extra
+    members, after the features.
+    """
+    yield '{"type": "FeatureCollection", "features": ['
+    for i, text in enumerate(features):
+        yield text if i == 0 else f", {text}"
+    yield "]"
+    for name, value in members.items():
+        yield f", {json.dumps(name)}: {json.dumps(value)}"
+    yield "}"
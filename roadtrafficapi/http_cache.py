@@ -0,0 +1,129 @@
+"""
+HTTP caching headers and conditional GETs.
+
+Data only changes on import, so responses can safely be cached by clients and
+nginx until the dataset version changes. Every successful JSON response gets
+a strong ETag built from the dataset version and the (normalised) request, so
+a request with a matching `If-None-Match` can be answered with a 304 before
+running any queries at all.
+"""
+
+import hashlib
+from datetime import timezone
+
+from flask import Response, g, request
+
+
+class HTTPCache:
+    """
+    `version` is called to get the current dataset version, and
+    `last_modified` when it last changed. `variant` is called to tell apart
+    different representations of the same URL, i.e. the content encoding.
+    """
+
+    methods = ("GET", "HEAD")
+    mimetypes = ("application/json", "application/geo+json")
+
+    def __init__(
+        self, app=None, version=None, last_modified=None, variant=None
+    ):
+        self.version = version
+        self.last_modified = last_modified
+        self.variant = variant
+        self._exempt = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("HTTP_CACHE_ENABLED", True)
+        app.config.setdefault("HTTP_CACHE_CONTROL", "public, max-age=300")
+
+        if not app.config["HTTP_CACHE_ENABLED"]:
+            return
+
+        self.config = app.config
+
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+
+    def exempt(self, view):
+        """
+        Decorator for views whose responses mustn't be cached, e.g. because
+        they change without the dataset version changing.
+        """
+        self._exempt.add(view.__name__)
+        return view
+
+    def etag(self):
+        args = sorted(request.args.items(multi=True))
+        key = repr(
+            (request.path, args, self.version(), self.variant())
+        ).encode()
+        return hashlib.sha1(key).hexdigest()
+
+    def before_request(self):
+        # Only the API's own views, not e.g. the docs or static files, which
+        # change with the code rather than the data.
+        if (
+            request.method not in self.methods
+            or request.endpoint in (None, "static")
+            or request.blueprint is not None
+        ):
+            return None
+
+        if request.endpoint in self._exempt:
+            g.http_cache_exempt = True
+            return None
+
+        g.http_cache_etag = etag = self.etag()
+
+        if request.if_none_match:
+            # If-None-Match takes precedence over If-Modified-Since
+            not_modified = request.if_none_match.contains(etag)
+        else:
+            not_modified = self._not_modified_since()
+
+        if not not_modified:
+            return None
+
+        g.http_cache_not_modified = True
+        return Response(status=304)
+
+    def after_request(self, response):
+        if g.get("http_cache_exempt"):
+            response.headers["Cache-Control"] = "no-store"
+            return response
+
+        etag = g.get("http_cache_etag")
+        if etag is None:
+            return response
+
+        if not (
+            g.get("http_cache_not_modified")
+            or (
+                response.status_code == 200
+                and response.mimetype in self.mimetypes
+            )
+        ):
+            return response
+
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = self.config["HTTP_CACHE_CONTROL"]
+        last_modified = self.last_modified()
+        if last_modified is not None:
+            response.last_modified = last_modified
+        response.vary.add("Accept-Encoding")
+        return response
+
+    def _not_modified_since(self):
+        if_modified_since = request.if_modified_since
+        last_modified = self.last_modified()
+        if if_modified_since is None or last_modified is None:
+            return False
+
+        # Older versions of Werkzeug give naive datetimes, in UTC
+        if if_modified_since.tzinfo is None:
+            if_modified_since = if_modified_since.replace(tzinfo=timezone.utc)
+
+        # HTTP dates are only accurate to the second
+        return last_modified.replace(microsecond=0) <= if_modified_since
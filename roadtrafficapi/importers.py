@@ -1,91 +1,733 @@
 import codecs
 import csv
+import io
+import json
+import os
+from collections import namedtuple
+from contextlib import contextmanager
 from urllib.request import urlopen
 
-from marshmallow.exceptions import ValidationError
+from flask import current_app
+from geoalchemy2 import Geometry
+from sqlalchemy import (
+    Column,
+    LargeBinary,
+    MetaData,
+    Table,
+    bindparam,
+    func,
+    text,
+)
 from sqlalchemy.orm import backref, relationship, scoped_session, sessionmaker
-from tqdm import tqdm
+from sqlalchemy.schema import CreateTable
 
 from . import db
-from .models import AADFByDirection
-from .schemas import aadf_by_direction_schema, list_aadf_by_direction_schema
+from .datasets import DATASETS
+from .models import Ward, WardSimplified, WardSubdivision
+from .versions import bump_dataset_version
 
+# First half of the advisory lock key taken while importing a local authority,
+# the second being its ID.
+IMPORT_LOCK_KEY = 50140
 
-def import_aadf_by_direction(local_authority_id):
+# First half of the advisory lock key taken while swapping a partition into a
+# dataset's table, the second being a hash of the dataset's name.
+SWAP_LOCK_KEY = 50142
+
+
+class TooManyInvalidRowsError(Exception):
+    """
+    More of a file's rows failed validation than allowed.
+    """
+
+    # No point retrying, the data needs fixing first
+    retryable = False
+
+    def __init__(self, rows_rejected, rows_parsed, rejects_path):
+        super().__init__(
+            f"{rows_rejected} of {rows_parsed} rows are invalid, see "
+            f"{rejects_path}"
+        )
+        self.rows_rejected = rows_rejected
+        self.rows_parsed = rows_parsed
+        self.rejects_path = rejects_path
+
+
+class MissingColumnsError(Exception):
+    """
+    A file doesn't have all the columns the dataset needs.
     """
-    Import of AADF By Direction data for a specific local authority.
+
+    # Retrying won't make them appear
+    retryable = False
+
+    def __init__(self, columns):
+        super().__init__(f"Missing columns: {', '.join(columns)}")
+        self.columns = columns
+
+
+# Outcome of an import. `rejects_path` is None if every row was valid.
+ImportResult = namedtuple(
+    "ImportResult", ["rows_inserted", "rows_rejected", "rejects_path"]
+)
+
+
+def import_dataset(
+    dataset,
+    local_authority_id,
+    path=None,
+    progress=None,
+    max_invalid=None,
+    rejects_path=None,
+):
+    """
+    Import of a dataset (a `Dataset`, or the name of one) for a specific local
+    authority.
 
     Is safe to run multiple times for the same local authority. Will remove
-    existing AADF By Direction records for the local authority before
-    attempting to insert data. Does not attempt to merge/patch data.
+    existing records for the local authority before attempting to insert
+    data. Does not attempt to merge/patch data.
+
+    Data is downloaded from DfT unless `path` to a local CSV (e.g. one made by
+    `generate-synthetic-data`) is given.
+
+    Invalid rows are skipped, and written to `rejects_path` along with what's
+    wrong with them. If more than `max_invalid` (a fraction of all rows) are
+    invalid, nothing is imported and `TooManyInvalidRowsError` is raised.
+    Both default to the app's config, see `ImportQueue`.
+
+    `progress`, if given, is called with (rows parsed, rows inserted, rows
+    rejected) as the import goes along. See `load_data`.
     """
 
-    # Deliberately allowing any exceptions to crash process. Database actions
-    # all occur in transations, so there's no chance of data loss in case of
-    # error; and the exception messages will explain issues perfectly fine.
+    # Deliberately allowing any other exceptions to crash process. Database
+    # actions all occur in transations, so there's no chance of data loss in
+    # case of error; and the exception messages will explain issues perfectly
+    # fine.
+
+    if isinstance(dataset, str):
+        dataset = DATASETS[dataset]
+
+    if max_invalid is None:
+        max_invalid = current_app.config["IMPORT_MAX_INVALID"]
+    if rejects_path is None:
+        rejects_dir = current_app.config["IMPORT_REJECTS_DIR"]
+        os.makedirs(rejects_dir, exist_ok=True)
+        rejects_path = os.path.join(
+            rejects_dir, f"{dataset.name}_{local_authority_id}_rejects.csv",
+        )
+
+    # Kept open (or downloading) until everything's loaded
+    with get_data(dataset, local_authority_id, path) as data:
+        # Check the file's the right shape before deleting anything, rather
+        # than rejecting every row for the same reason.
+        missing = dataset.missing_columns(data.fieldnames or [])
+        if missing:
+            raise MissingColumnsError(missing)
+
+        # Imports can legitimately take minutes, so don't let any statement
+        # timeout meant for API requests kill them.
+        db.session.execute("SET LOCAL statement_timeout = 0")
 
-    data = get_aadf_by_direction_data(local_authority_id)
+        # Only one import of a local authority at a time (e.g. a queued job and
+        # someone running the CLI), otherwise both would delete the existing
+        # records then each insert a full set.
+        db.session.execute(
+            text("SELECT pg_advisory_xact_lock(:key, :local_authority_id)"),
+            {
+                "key": IMPORT_LOCK_KEY,
+                "local_authority_id": int(local_authority_id),
+            },
+        )
 
-    if data:
-        # Delete existing records
-        delete_aadf_by_direction_data(local_authority_id, db.session)
+        if dataset.partitioned:
+            # Load into a new table, leaving the existing partition to carry on
+            # serving requests until it's swapped out
+            table = create_staging_table(
+                dataset, local_authority_id, db.session
+            )
+        else:
+            # Delete existing records
+            delete_data(dataset, local_authority_id, db.session)
+            table = dataset.table.name
 
         # Add new records
-        load_aadf_by_direction_data(data, db.session)
+        with RejectsFile(rejects_path) as rejects:
+            rows_parsed, rows_inserted = load_data(
+                dataset,
+                local_authority_id,
+                data,
+                db.session,
+                rejects,
+                progress,
+                table=table,
+            )
+
+    if rows_parsed and rejects.count / rows_parsed > max_invalid:
+        db.session.rollback()
+        raise TooManyInvalidRowsError(rejects.count, rows_parsed, rejects_path)
+
+    if dataset.partitioned:
+        prepare_partition(dataset, local_authority_id, table, db.session)
+        # Nothing so far has touched the dataset's table, from here on it's
+        # locked until commit
+        lock_dataset(dataset, db.session)
+        swap_partition(dataset, local_authority_id, table, db.session)
+
+    # Let caches in the API workers know the data has changed
+    bump_dataset_version(dataset.name, local_authority_id, db.session)
+
+    db.session.commit()
 
+    # Anything derived from the whole dataset (e.g. the spatial index) is
+    # rebuilt from what's committed, one import at a time so none misses
+    # another's rows.
+    if dataset.after_commit is not None:
+        # A new transaction, so the import's setting no longer applies
+        db.session.execute("SET LOCAL statement_timeout = 0")
+        lock_dataset(dataset, db.session)
+        dataset.after_commit(db.session)
         db.session.commit()
 
+    return ImportResult(
+        rows_inserted, rejects.count, rejects_path if rejects.count else None
+    )
+
 
-def delete_aadf_by_direction_data(local_authority_id, session):
+def delete_data(dataset, local_authority_id, session):
     """
-    Adds deletion of all existing AADF By Direction records for the specified
+    Adds deletion of all existing records of the dataset for the specified
     local authority to the supplied session.
     """
-    q = AADFByDirection.__table__.delete().where(
-        AADFByDirection.local_authority_id == local_authority_id
+    table = dataset.table
+    q = table.delete().where(
+        table.c[dataset.partition_by] == local_authority_id
     )
     session.execute(q)
 
 
-def load_aadf_by_direction_data(data, session):
+def create_staging_table(dataset, local_authority_id, session):
+    """
+    Adds creating an empty table, shaped like the dataset's, to load a local
+    authority's records into before `swap_partition`. Returns its name.
+
+    No indexes yet, they're built in one go by `prepare_partition` once the
+    rows are in, which is much quicker than keeping them up to date row by
+    row.
+    """
+    name = f"{dataset.partition_name(local_authority_id)}_new"
+
+    # From the model rather than `LIKE` the dataset's table, which would hold
+    # a lock on it until commit, and deadlock with any other import's swap.
+    columns = []
+    for column in dataset.table.columns:
+        default = None
+        if column.name in dataset.generated:
+            # Same sequence as the dataset's table, named as PostgreSQL names
+            # those of serial columns
+            default = text(
+                f"nextval('{dataset.table.name}_{column.name}_seq')"
+            )
+        columns.append(
+            Column(
+                column.name,
+                column.type,
+                nullable=column.nullable,
+                server_default=default,
+            )
+        )
+    # Executing the DDL directly (rather than `Table.create`) also skips
+    # GeoAlchemy creating GiST indexes up front
+    session.execute(CreateTable(Table(name, MetaData(), *columns)))
+    return name
+
+
+def staging_indexes(dataset):
+    """
+    (name suffix, SQL) of the primary key and indexes a partition needs to
+    match those of the dataset's table, with `{table}` to fill in.
+
+    Suffixes follow PostgreSQL's own naming of partitions' indexes.
+    """
+    table = dataset.table
+    primary_key = ", ".join(
+        column.name for column in table.primary_key.columns
+    )
+    indexes = [
+        ("pkey", f"ALTER TABLE {{table}} ADD PRIMARY KEY ({primary_key})")
+    ]
+    for index in sorted(table.indexes, key=lambda index: index.name):
+        columns = [column.name for column in index.columns]
+        unique = "UNIQUE " if index.unique else ""
+        suffix = f"{'_'.join(columns)}_idx"
+        indexes.append(
+            (
+                suffix,
+                f"CREATE {unique}INDEX {{table}}_{suffix} "
+                f"ON {{table}} ({', '.join(columns)})",
+            )
+        )
+    # GeoAlchemy's GiST indexes aren't in `table.indexes`
+    for column in table.columns:
+        if isinstance(column.type, Geometry) and column.type.spatial_index:
+            suffix = f"{column.name}_idx1"
+            indexes.append(
+                (
+                    suffix,
+                    f"CREATE INDEX {{table}}_{suffix} "
+                    f"ON {{table}} USING GIST ({column.name})",
+                )
+            )
+    return indexes
+
+
+def prepare_partition(dataset, local_authority_id, staging, session):
+    """
+    Adds getting the loaded `staging` table ready to be attached to the
+    session: its primary key, indexes, statistics and a check constraint
+    matching the partition's bounds.
+
+    None of this touches the dataset's table, so readers aren't held up
+    however long it takes. Attaching then just adopts the indexes and skips
+    scanning the rows.
+    """
+    partition = dataset.partition_name(local_authority_id)
+    session.execute(
+        f"ALTER TABLE {staging} ADD CONSTRAINT {partition}_check "
+        f"CHECK ({dataset.partition_by} = {int(local_authority_id)})"
+    )
+    for _, sql in staging_indexes(dataset):
+        session.execute(sql.format(table=staging))
+    session.execute(f"ANALYZE {staging}")
+
+
+def lock_dataset(dataset, session):
+    """
+    Adds taking the dataset wide advisory lock to the session, held until the
+    transaction ends.
+
+    Taken before swapping in a partition, so swaps of different local
+    authorities happen one at a time rather than deadlocking over the locks
+    on the dataset's table, and before rebuilding anything derived from the
+    whole dataset, so rebuilds don't overwrite each other's.
+    """
+    session.execute(
+        text("SELECT pg_advisory_xact_lock(:key, hashtext(:dataset))"),
+        {"key": SWAP_LOCK_KEY, "dataset": dataset.name},
+    )
+
+
+def swap_partition(dataset, local_authority_id, staging, session):
+    """
+    Adds replacing the local authority's partition with the `staging` table
+    (see `prepare_partition`) to the session.
+
+    Dropping and attaching partitions locks the dataset's whole table until
+    the transaction commits, so this should be the last thing an import does.
+    It's only catalog changes, so readers are held up for moments rather than
+    the whole load. There's no mass delete, so no dead rows left behind for
+    vacuum to clean up, the old partition is simply dropped.
+    """
+    table = dataset.table.name
+    partition = dataset.partition_name(local_authority_id)
+    local_authority_id = int(local_authority_id)
+
+    # Any of the local authority's rows which ended up in the default
+    # partition would stop the new partition being attached
+    session.execute(
+        text(
+            f"DELETE FROM {table}_default "
+            f"WHERE {dataset.partition_by} = :local_authority_id"
+        ),
+        {"local_authority_id": local_authority_id},
+    )
+
+    session.execute(f"DROP TABLE IF EXISTS {partition}")
+    session.execute(f"ALTER TABLE {staging} RENAME TO {partition}")
+    for suffix, _ in staging_indexes(dataset):
+        session.execute(
+            f"ALTER INDEX {staging}_{suffix} RENAME TO {partition}_{suffix}"
+        )
+    session.execute(
+        f"ALTER TABLE {table} ATTACH PARTITION {partition} "
+        f"FOR VALUES IN ({local_authority_id})"
+    )
+    # The partition's own constraint covers it now
+    session.execute(
+        f"ALTER TABLE {partition} DROP CONSTRAINT {partition}_check"
+    )
+
+
+class RejectsFile:
+    """
+    CSV of rows which failed validation, with the row number (counting the
+    header as row 1) and errors for each.
+
+    Any existing file is removed, and a new one only created if there's
+    something to write, so it's only there if the last import had problems.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def __enter__(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._file is not None:
+            self._file.close()
+
+    def write(self, row_number, row, errors):
+        if self._writer is None:
+            self._file = open(self.path, "w", newline="", encoding="utf-8")
+            self._writer = csv.DictWriter(
+                self._file,
+                ["row_number", "errors", *(k for k in row if k is not None)],
+                extrasaction="ignore",
+            )
+            self._writer.writeheader()
+
+        self._writer.writerow(
+            {**row, "row_number": row_number, "errors": json.dumps(errors)}
+        )
+        self.count += 1
+
+
+def load_data(
+    dataset,
+    local_authority_id,
+    data,
+    session,
+    rejects,
+    progress=None,
+    batch_size=10000,
+    table=None,
+):
     """
-    Save AADF By Direction data into the database.
+    Save a dataset's rows into the database, returning how many rows were
+    parsed and inserted.
+
+    Each row is parsed and validated as declared by the `Dataset`. Rows which
+    fail validation are written to `rejects` (a `RejectsFile`), and the rest
+    carry on regardless, so one pass finds every problem in the file.
 
-    Converts each incoming dict to a model using the appropriate Marshmallow
-    Schema, which provides the opportunity for simple data cleansing.
+    Rows are loaded with COPY, `batch_size` at a time, which is many times
+    quicker than INSERTs (even bulk ones) and never builds model instances.
+    After each batch `progress` (if given) is called with the number of rows
+    parsed, inserted and rejected so far; otherwise a progress bar is shown.
+
+    Rows go into the dataset's table, unless the name of another `table` is
+    given.
     """
+    # Only needed for imports, so don't slow down starting the app with it
+    from tqdm import tqdm
+
+    rows_parsed = rows_inserted = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    batch = 0
+
+    def save():
+        nonlocal rows_inserted, batch
+        buffer.seek(0)
+        copy_data(dataset, buffer, session, table)
+        buffer.seek(0)
+        buffer.truncate()
+        rows_inserted += batch
+        batch = 0
+        if progress is not None:
+            progress(rows_parsed, rows_inserted, rejects.count)
+
+    # Row 1 is the header
+    for row_number, row in enumerate(
+        tqdm(data, disable=progress is not None), start=2
+    ):
+        rows_parsed += 1
+        try:
+            values = dataset.parse_row(row, local_authority_id)
+        except ValueError as e:
+            rejects.write(row_number, row, e.args[0])
+            continue
+        writer.writerow(values)
+        batch += 1
+
+        if batch >= batch_size:
+            save()
+
+    save()
 
-    # Unfortunately the combination of DictReader, a generator of streamed data
-    # (codecs.iterdecode) and Marshmallow's `many` Schema doesn't work nicely,
-    # so need to actually loop through each row.
-    aadf_by_directions = []
-    for row in tqdm(data):
-        # May raise validation errors
-        # (`marshmallow.exceptions.ValidationError`). Deliberately not handling
-        # them here and allowing them to bubble.
-        aadf_by_direction = aadf_by_direction_schema.load(row)
-        print(aadf_by_direction.point)
-        aadf_by_directions.append(aadf_by_direction)
+    return rows_parsed, rows_inserted
 
-    session.bulk_save_objects(aadf_by_directions)
 
+def copy_data(dataset, f, session, table=None):
+    """
+    COPY rows (as CSV, in `Dataset.column_names` order) from the file-like
+    `f` into the dataset's table (or `table`), within the session's
+    transaction.
 
-def get_aadf_by_direction_data(local_authority_id):
+    Empty (unquoted) values are loaded as NULL.
     """
-    Get a DictReader of the specified AADF By Direction dataset.
+    table = table or dataset.table.name
+    columns = ", ".join(dataset.column_names)
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", f
+        )
+    finally:
+        cursor.close()
+
+
+@contextmanager
+def get_data(dataset, local_authority_id, path=None):
+    """
+    Context manager giving a DictReader of the dataset for the specified local
+    authority, closing the file (or download) afterwards.
+
+    Reads from the local CSV at `path` if given, otherwise from DfT.
     """
 
-    # URL likely to change now and again. No guarantee the URL will remain
-    # easily constructable, so not much point moving to config.
-    url = f"https://dft-statistics.s3.amazonaws.com/road-traffic/downloads/aadfbydirection/local_authority_id/dft_aadfbydirection_local_authority_id_{local_authority_id}.csv"
+    if path:
+        with open(path, newline="", encoding="utf-8") as f:
+            yield csv.DictReader(f)
+        return
 
     # Deliberately not handling any errors here. Let it crash and inspect
     # manually.
-    csv_stream = urlopen(url)
+    with urlopen(dataset.download_url(local_authority_id)) as csv_stream:
+        # CSV files tend to be a few MB, so use a generator (codecs.iterdecode)
+        # to stream the CSV data and make the read process a bit more memory
+        # efficient.
+        yield csv.DictReader(codecs.iterdecode(csv_stream, "utf-8"))
+
+
+# Tolerance (in degrees) used for each level of simplified ward geometry
+WARD_SIMPLIFIED_TOLERANCES = {"medium": 0.0001, "low": 0.001}
+
+# Maximum number of vertices in each piece of subdivided ward geometry
+WARD_SUBDIVIDE_MAX_VERTICES = 64
+
+# Tables replaced by each ward import, and their serial columns
+WARD_TABLES = {
+    "wards": "gid",
+    "ward_subdivisions": "id",
+    "ward_simplified": None,
+}
 
-    # CSV files tend to be a few MB, so use a generator (codecs.iterdecode) to
-    # stream the CSV data and make the read process a bit more memory
-    # efficient.
-    csv_file = csv.DictReader(codecs.iterdecode(csv_stream, "utf-8"))
 
-    return csv_file
+def ward_staging_table(table):
+    """
+    Name of the table new wards are loaded into, before being swapped in as
+    `table`.
+    """
+    return f"{table}_new"
+
+
+def create_ward_staging_tables(session):
+    """
+    Adds creating empty copies of the ward tables (with the same columns,
+    constraints and indexes) to the session.
+
+    Serial columns get a sequence of their own, rather than sharing (and
+    having to reset) the original's, which isn't transactional. Starting
+    afresh means ward gids stay the same when reimporting the same file.
+    """
+    for table, serial in WARD_TABLES.items():
+        staging = ward_staging_table(table)
+        session.execute(
+            f"CREATE TABLE {staging} "
+            f"(LIKE {table} INCLUDING ALL EXCLUDING DEFAULTS)"
+        )
+        if serial is not None:
+            sequence = f"{staging}_{serial}_seq"
+            session.execute(
+                f"CREATE SEQUENCE {sequence} OWNED BY {staging}.{serial}"
+            )
+            session.execute(
+                f"ALTER TABLE {staging} ALTER COLUMN {serial} "
+                f"SET DEFAULT nextval('{sequence}')"
+            )
+
+
+def swap_ward_tables(session):
+    """
+    Adds replacing the ward tables with their staging copies to the session.
+
+    Indexes (and constraints) and sequences of the copies are renamed to
+    match the tables they replace, e.g. `wards_new_pkey` to `wards_pkey`, so
+    names don't drift from one import to the next.
+    """
+    for table, serial in WARD_TABLES.items():
+        staging = ward_staging_table(table)
+
+        # Takes the old table's sequence with it
+        session.execute(f"DROP TABLE {table}")
+        session.execute(f"ALTER TABLE {staging} RENAME TO {table}")
+        if serial is not None:
+            session.execute(
+                f"ALTER SEQUENCE {staging}_{serial}_seq "
+                f"RENAME TO {table}_{serial}_seq"
+            )
+
+        indexes = session.execute(
+            text(
+                "SELECT indexname FROM pg_indexes "
+                "WHERE schemaname = current_schema() AND tablename = :table"
+            ),
+            {"table": table},
+        )
+        for (index,) in indexes.fetchall():
+            if index.startswith(staging):
+                session.execute(
+                    f"ALTER INDEX {index} "
+                    f"RENAME TO {table}{index[len(staging):]}"
+                )
+
+
+def import_wards(path, srid=4326, batch_size=500):
+    """
+    Import wards from a shapefile or GeoJSON file.
+
+    Replaces all existing wards. They're loaded into new tables, along with
+    their GiST index, subdivided and simplified geometries, which are then
+    swapped in with the old ones at the very end. All in a single transaction,
+    so the API carries on using the old wards until the new ones are
+    completely ready, and is only locked out of them for the swap.
+
+    `srid` is the SRID of the file's coordinates, which are transformed to
+    WGS84 (4326) if need be.
+    """
+    from tqdm import tqdm
+
+    # Don't let any statement timeout meant for API requests kill the import
+    db.session.execute("SET LOCAL statement_timeout = 0")
+
+    connection = db.session.connection()
+    for model in (Ward, WardSubdivision, WardSimplified):
+        model.__table__.create(connection, checkfirst=True)
+
+    create_ward_staging_tables(db.session)
+
+    batch = []
+    for ward in tqdm(read_wards(path)):
+        batch.append(ward)
+        if len(batch) >= batch_size:
+            load_wards(batch, srid, db.session)
+            batch = []
+    if batch:
+        load_wards(batch, srid, db.session)
+
+    build_ward_geometries(db.session)
+
+    for table in WARD_TABLES:
+        db.session.execute(f"ANALYZE {ward_staging_table(table)}")
+
+    swap_ward_tables(db.session)
+
+    # Wards aren't split by local authority, so version them as a whole
+    bump_dataset_version("wards", 0, db.session)
+
+    db.session.commit()
+
+
+def read_wards(path):
+    """
+    Generate (properties, geometry) tuples for each ward in a shapefile or
+    GeoJSON file. Geometry is a GeoJSON-like dict.
+    """
+    if path.lower().endswith((".json", ".geojson")):
+        # GeoJSON has to be read in one go, but is only used for relatively
+        # small files, e.g. from `generate-synthetic-data`.
+        with open(path, encoding="utf-8") as f:
+            features = json.load(f)["features"]
+        for feature in features:
+            yield feature["properties"], feature["geometry"]
+    else:
+        # Shapefiles are read a record at a time
+        import shapefile
+
+        with shapefile.Reader(path) as reader:
+            for shape_record in reader.iterShapeRecords():
+                yield (
+                    shape_record.record.as_dict(),
+                    shape_record.shape.__geo_interface__,
+                )
+
+
+def load_wards(wards, srid, session):
+    """
+    Adds inserting a batch of (properties, geometry) tuples to the session,
+    into the staging copy of `wards`.
+
+    Properties are matched to `Ward` columns case insensitively, as the ONS
+    shapefiles use upper case field names.
+    """
+    from shapely.geometry import shape
+
+    columns = [
+        column.name
+        for column in Ward.__table__.columns
+        if column.name not in ("gid", "geom")
+    ]
+
+    rows = []
+    for properties, geometry in wards:
+        properties = {k.lower(): v for k, v in properties.items()}
+        row = {column: properties.get(column) for column in columns}
+        row["wkb"] = shape(geometry).wkb
+        rows.append(row)
+
+    staging = Ward.__table__.tometadata(
+        MetaData(), name=ward_staging_table(Ward.__tablename__)
+    )
+    q = staging.insert().values(
+        geom=func.ST_Multi(
+            func.ST_Transform(
+                func.ST_GeomFromWKB(bindparam("wkb", type_=LargeBinary), srid),
+                4326,
+            )
+        )
+    )
+    session.execute(q, rows)
+
+
+def build_ward_geometries(session):
+    """
+    Adds building the index, subdivided and simplified ward geometries (from
+    the staging copy of `wards` into those of the other tables) to the
+    session.
+    """
+    wards = ward_staging_table("wards")
+    subdivisions = ward_staging_table("ward_subdivisions")
+    simplified = ward_staging_table("ward_simplified")
+
+    # The copy of an existing index is given this name too, e.g. if the
+    # original table came from `shp2pgsql -I`.
+    session.execute(
+        f"CREATE INDEX IF NOT EXISTS {wards}_geom_idx "
+        f"ON {wards} USING GIST (geom)"
+    )
+
+    session.execute(
+        text(
+            f"INSERT INTO {subdivisions} (ward_gid, geom) "
+            f"SELECT gid, ST_Subdivide(geom, :max_vertices) FROM {wards}"
+        ),
+        {"max_vertices": WARD_SUBDIVIDE_MAX_VERTICES},
+    )
+
+    for detail, tolerance in WARD_SIMPLIFIED_TOLERANCES.items():
+        session.execute(
+            text(
+                f"INSERT INTO {simplified} (ward_gid, detail, geom) "
+                "SELECT gid, :detail, "
+                "ST_Multi(ST_SimplifyPreserveTopology(geom, :tolerance)) "
+                f"FROM {wards}"
+            ),
+            {"detail": detail, "tolerance": tolerance},
+        )
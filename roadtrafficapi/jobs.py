@@ -0,0 +1,393 @@
+"""
+Background import jobs, queued in PostgreSQL.
+
+Jobs are rows in the `import_jobs` table, so there's no separate message broker
+to run. Workers (`flask import-worker`) claim them with
+`SELECT ... FOR UPDATE SKIP LOCKED`, so any number of workers can poll the same
+table without stepping on each other.
+
+No more than `IMPORT_CONCURRENCY` jobs run at once, across all workers, so
+imports can't swamp the database the API reads from. Each running job holds
+one of that many PostgreSQL advisory locks.
+
+Failed jobs are retried, backing off each time, up to `max_attempts` times.
+Imports are all or nothing, so retrying is always safe. Errors marked as not
+`retryable` (e.g. too many invalid rows) fail the job straight away.
+"""
+
+import hmac
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from sqlalchemy import and_, func, or_, text
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+STATUSES = (QUEUED, RUNNING, SUCCEEDED, FAILED)
+
+# First half of the advisory lock keys used to limit concurrency, the second
+# being the slot. Arbitrary, just mustn't clash with other advisory locks.
+LOCK_KEY = 50141
+
+# Don't write progress to the database more often than this (seconds)
+PROGRESS_INTERVAL = 1
+
+# How often running jobs update their heartbeat (seconds). Needs to be well
+# within IMPORT_JOB_TIMEOUT.
+HEARTBEAT_INTERVAL = 30
+
+
+def get_importer(dataset):
+    """
+    Import function for a dataset, called with
+    (local authority ID, path, progress) and returning an `ImportResult`.
+    """
+    from .importers import import_dataset
+
+    return partial(import_dataset, dataset)
+
+
+class Heartbeat:
+    """
+    Keeps a running job's `heartbeat_at` up to date from a background thread,
+    for as long as the `with` block runs.
+
+    Progress updates alone aren't enough, as there are none during long
+    statements (e.g. building indexes), and jobs with no heartbeat for
+    `IMPORT_JOB_TIMEOUT` are taken to have died.
+    """
+
+    def __init__(self, engine, job_id, interval=HEARTBEAT_INTERVAL):
+        self.engine = engine
+        self.job_id = job_id
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self.run, name=f"heartbeat-{job_id}", daemon=True
+        )
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def run(self):
+        from .models import ImportJob
+
+        table = ImportJob.__table__
+        while not self._stop.wait(self.interval):
+            try:
+                # Own connection, as the import's is busy (and its transaction
+                # wouldn't be visible to anyone else until it's finished).
+                with self.engine.begin() as connection:
+                    connection.execute(
+                        table.update()
+                        .where(table.c.id == self.job_id)
+                        .values(heartbeat_at=func.now())
+                    )
+            except Exception:
+                # Try again next time, the job itself may well be fine
+                logger.exception(
+                    "Couldn't update heartbeat of job %s", self.job_id
+                )
+
+
+class ImportQueue:
+    """
+    Enqueue, claim and run import jobs.
+    """
+
+    def __init__(self, app=None):
+        self._stopping = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("IMPORT_CONCURRENCY", 1)
+        app.config.setdefault("IMPORT_JOB_MAX_ATTEMPTS", 3)
+        app.config.setdefault("IMPORT_JOB_RETRY_DELAY", 60)
+        app.config.setdefault("IMPORT_JOB_TIMEOUT", 600)
+        app.config.setdefault("IMPORT_JOBS_TOKEN", None)
+        # Used by the importers themselves, whether run by a job or not
+        app.config.setdefault("IMPORT_MAX_INVALID", 0.01)
+        app.config.setdefault("IMPORT_REJECTS_DIR", "rejects")
+        self.config = app.config
+
+    @property
+    def datasets(self):
+        """
+        Names of the datasets which can be imported, see `datasets.py`.
+        """
+        from .datasets import DATASETS
+
+        return tuple(DATASETS)
+
+    def check_token(self, token):
+        """
+        Whether `token` allows changing jobs over the API. Always false if no
+        `IMPORT_JOBS_TOKEN` is configured.
+        """
+        expected = self.config["IMPORT_JOBS_TOKEN"]
+        return bool(expected and token) and hmac.compare_digest(
+            token.encode(), expected.encode()
+        )
+
+    def enqueue(self, dataset, local_authority_id, path=None):
+        """
+        Queue an import, unless one for the same data is already waiting.
+        """
+        from . import db
+        from .models import ImportJob
+
+        job = ImportJob.query.filter_by(
+            dataset=dataset,
+            local_authority_id=local_authority_id,
+            path=path,
+            status=QUEUED,
+        ).first()
+        if job is None:
+            job = ImportJob(
+                dataset=dataset,
+                local_authority_id=local_authority_id,
+                path=path,
+                status=QUEUED,
+                attempts=0,
+                max_attempts=self.config["IMPORT_JOB_MAX_ATTEMPTS"],
+                rows_parsed=0,
+                rows_inserted=0,
+                rows_rejected=0,
+            )
+            db.session.add(job)
+            db.session.commit()
+
+        return job
+
+    def retry(self, job):
+        """
+        Queue a failed job to run again, with a fresh set of attempts.
+        """
+        from . import db
+
+        job.status = QUEUED
+        job.attempts = 0
+        job.error = None
+        job.run_after = func.now()
+        job.finished_at = None
+        db.session.commit()
+
+    def claim(self):
+        """
+        Claim the next job which is due, marking it as running.
+
+        Jobs left running by a worker which has since died (i.e. with no
+        heartbeat for `IMPORT_JOB_TIMEOUT` seconds) are up for grabs too.
+        """
+        from . import db
+        from .models import ImportJob
+
+        timeout = timedelta(seconds=self.config["IMPORT_JOB_TIMEOUT"])
+        while True:
+            job = (
+                ImportJob.query.filter(
+                    or_(
+                        and_(
+                            ImportJob.status == QUEUED,
+                            ImportJob.run_after <= func.now(),
+                        ),
+                        and_(
+                            ImportJob.status == RUNNING,
+                            ImportJob.heartbeat_at < func.now() - timeout,
+                        ),
+                    )
+                )
+                .order_by(ImportJob.run_after, ImportJob.id)
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if job is None:
+                db.session.commit()
+                return None
+
+            if job.attempts >= job.max_attempts:
+                job.status = FAILED
+                job.error = "Worker stopped responding"
+                job.finished_at = func.now()
+                db.session.commit()
+                continue
+
+            job.status = RUNNING
+            job.attempts += 1
+            job.worker = f"{socket.gethostname()}:{os.getpid()}"
+            job.error = None
+            job.rows_parsed = job.rows_inserted = job.rows_rejected = 0
+            job.rejects_path = None
+            job.started_at = job.heartbeat_at = func.now()
+            job.finished_at = None
+            db.session.commit()
+            return job
+
+    def run(self, job):
+        """
+        Run a claimed job, recording how it went.
+        """
+        from . import db
+        from .models import ImportJob
+
+        table = ImportJob.__table__
+        job_id = job.id
+        last_progress = time.monotonic()
+
+        def progress(rows_parsed, rows_inserted, rows_rejected):
+            nonlocal last_progress
+            if time.monotonic() - last_progress < PROGRESS_INTERVAL:
+                return
+            last_progress = time.monotonic()
+
+            # Separate connection, as the import's own transaction won't be
+            # visible to anyone else until it's finished.
+            with db.engine.begin() as connection:
+                connection.execute(
+                    table.update()
+                    .where(table.c.id == job_id)
+                    .values(
+                        rows_parsed=rows_parsed,
+                        rows_inserted=rows_inserted,
+                        rows_rejected=rows_rejected,
+                        heartbeat_at=func.now(),
+                    )
+                )
+
+        importer = get_importer(job.dataset)
+        logger.info(
+            "Running job %s: %s for local authority %s (attempt %s of %s)",
+            job.id,
+            job.dataset,
+            job.local_authority_id,
+            job.attempts,
+            job.max_attempts,
+        )
+
+        try:
+            with Heartbeat(db.engine, job_id):
+                result = importer(job.local_authority_id, job.path, progress)
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("Job %s failed", job_id)
+
+            job = ImportJob.query.get(job_id)
+            job.error = traceback.format_exc(limit=5)
+            if hasattr(e, "rejects_path"):
+                job.rows_parsed = e.rows_parsed
+                job.rows_inserted = 0
+                job.rows_rejected = e.rows_rejected
+                job.rejects_path = e.rejects_path
+
+            if job.attempts < job.max_attempts and getattr(
+                e, "retryable", True
+            ):
+                # Back off a little more each time
+                delay = self.config["IMPORT_JOB_RETRY_DELAY"] * 2 ** (
+                    job.attempts - 1
+                )
+                job.status = QUEUED
+                job.run_after = func.now() + timedelta(seconds=delay)
+            else:
+                job.status = FAILED
+                job.finished_at = func.now()
+            db.session.commit()
+            return job
+
+        job = ImportJob.query.get(job_id)
+        job.status = SUCCEEDED
+        job.rows_parsed = result.rows_inserted + result.rows_rejected
+        job.rows_inserted = result.rows_inserted
+        job.rows_rejected = result.rows_rejected
+        job.rejects_path = result.rejects_path
+        job.finished_at = job.heartbeat_at = func.now()
+        db.session.commit()
+
+        logger.info(
+            "Job %s imported %s rows, rejected %s (%.0f rows/s)",
+            job.id,
+            job.rows_inserted,
+            job.rows_rejected,
+            job.rows_per_second or 0,
+        )
+        return job
+
+    def acquire_slot(self, connection):
+        """
+        Take one of the `IMPORT_CONCURRENCY` slots, returning which, or None
+        if they're all in use.
+        """
+        for slot in range(self.config["IMPORT_CONCURRENCY"]):
+            acquired = connection.execute(
+                text("SELECT pg_try_advisory_lock(:key, :slot)"),
+                {"key": LOCK_KEY, "slot": slot},
+            ).scalar()
+            if acquired:
+                return slot
+        return None
+
+    def release_slot(self, connection, slot):
+        connection.execute(
+            text("SELECT pg_advisory_unlock(:key, :slot)"),
+            {"key": LOCK_KEY, "slot": slot},
+        )
+
+    def work(self, poll_interval=5, once=False):
+        """
+        Run jobs as they come in, until stopped (SIGTERM or SIGINT), finishing
+        any job that's already running first.
+
+        If `once`, stop as soon as there's nothing left to do.
+        """
+        from . import db
+
+        def stop(signum, frame):
+            logger.info("Stopping after the current job")
+            self._stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        # Advisory locks belong to the connection, so keep one just for them.
+        # Autocommit, so it's not left idle in a transaction.
+        connection = db.engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        )
+        try:
+            while not self._stopping:
+                slot = self.acquire_slot(connection)
+                if slot is None:
+                    time.sleep(poll_interval)
+                    continue
+
+                try:
+                    job = self.claim()
+                    if job is not None:
+                        self.run(job)
+                finally:
+                    self.release_slot(connection, slot)
+                    db.session.remove()
+
+                if job is None:
+                    if once:
+                        break
+                    time.sleep(poll_interval)
+        finally:
+            connection.close()
@@ -0,0 +1,431 @@
+"""
+Load testing, by replaying traffic against a running instance of the API.
+
+Requests either come from an access log (e.g. nginx's, so production traffic
+can be replayed as-is) or a weighted mix of the API's routes, filled in with
+local authorities, years and coordinates found in the data being served.
+
+Concurrency is ramped up in stages. Each stage reports throughput, latency
+percentiles and errors, alongside the queries which took up the most database
+time according to `pg_stat_statements`, so it's clear where (and why) the API
+stops keeping up.
+
+Requests are sent from threads, so a single load test process tops out at a
+few thousand requests a second. Run several if that's not enough.
+"""
+
+import http.client
+import json
+import random
+import re
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from sqlalchemy import text
+
+from .benchmarks import percentile
+
+# Relative weights of each kind of request in the default mix, roughly
+# following what the API gets in production.
+ROUTE_WEIGHTS = {
+    "by_direction_local_authority": 30,
+    "by_direction_spatial": 20,
+    "ward_lookup": 15,
+    "aadf_local_authority": 10,
+    "local_authority_list": 10,
+    "road_list": 5,
+    "year_list": 5,
+    "ward_list": 5,
+}
+
+# Request line of a combined format access log, e.g. nginx's default
+LOG_REQUEST = re.compile(r'"(?:GET|HEAD) (\S+) HTTP/[\d.]+"')
+
+# Columns of pg_stat_statements, if the extension is installed
+COLUMNS_QUERY = """
+SELECT column_name FROM information_schema.columns
+WHERE table_name = 'pg_stat_statements'
+"""
+
+# Statements diffed from pg_stat_statements, `total` being the column holding
+# total execution time (renamed in PostgreSQL 13).
+STATEMENTS_QUERY = """
+SELECT queryid, query, calls, {total} AS total_time
+FROM pg_stat_statements
+WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+"""
+
+
+def read_log(path):
+    """
+    Request paths from an access log (combined format) or a file of one path
+    per line. Only GETs and HEADs are replayed.
+    """
+    paths = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("/"):
+                paths.append(line)
+                continue
+
+            match = LOG_REQUEST.search(line)
+            if match:
+                paths.append(match.group(1))
+    return paths
+
+
+def replay(paths):
+    """
+    Endless iterator over logged `paths`, in order.
+    """
+    while True:
+        yield from paths
+
+
+def get_json(connection, path):
+    connection.request("GET", path)
+    response = connection.getresponse()
+    body = response.read()
+    if response.status != 200:
+        raise RuntimeError(f"{path} returned {response.status}")
+    return json.loads(body)
+
+
+def discover(base_url, timeout=30):
+    """
+    Local authority IDs, years and count point coordinates to fill in the
+    route mix, from the API itself.
+    """
+    connection = connect(base_url, timeout)
+    try:
+        local_authorities = get_json(
+            connection, "/api/by-direction/local-authority/"
+        )["data"]
+        years = get_json(connection, "/api/by-direction/year/")["data"]
+        local_authority_ids = [
+            la["local_authority_id"] for la in local_authorities
+        ]
+        if not local_authority_ids:
+            raise RuntimeError("No data to test against, import some first")
+
+        coordinates = []
+        for local_authority_id in local_authority_ids[:10]:
+            records = get_json(
+                connection,
+                "/api/by-direction/?"
+                + urlencode({"local_authority_id": local_authority_id}),
+            )["data"]
+            coordinates.extend(
+                (record["longitude"], record["latitude"]) for record in records
+            )
+    finally:
+        connection.close()
+
+    return {
+        "local_authority_ids": local_authority_ids,
+        "years": [year["year"] for year in years],
+        "coordinates": coordinates,
+    }
+
+
+def route_mix(values, seed=None):
+    """
+    Endless iterator over requests for a weighted mix of routes, using
+    `values` from `discover`.
+    """
+    rng = random.Random(seed)
+    routes = list(ROUTE_WEIGHTS)
+    weights = list(ROUTE_WEIGHTS.values())
+
+    def near_count_point():
+        longitude, latitude = rng.choice(values["coordinates"])
+        # Searches are rarely right on top of a count point
+        return (
+            round(longitude + rng.uniform(-0.01, 0.01), 6),
+            round(latitude + rng.uniform(-0.01, 0.01), 6),
+        )
+
+    while True:
+        route = rng.choices(routes, weights)[0]
+        local_authority_id = rng.choice(values["local_authority_ids"])
+
+        if route == "by_direction_local_authority":
+            params = {"local_authority_id": local_authority_id}
+            if values["years"] and rng.random() < 0.5:
+                params["year"] = rng.choice(values["years"])
+            yield "/api/by-direction/?" + urlencode(params)
+        elif route == "by_direction_spatial":
+            longitude, latitude = near_count_point()
+            params = {
+                "longitude": longitude,
+                "latitude": latitude,
+                "distance": rng.choice([500, 1000, 3000]),
+            }
+            yield "/api/by-direction/?" + urlencode(params)
+        elif route == "ward_lookup":
+            longitude, latitude = near_count_point()
+            params = {"longitude": longitude, "latitude": latitude}
+            yield "/api/ward/lookup/?" + urlencode(params)
+        elif route == "aadf_local_authority":
+            params = {"local_authority_id": local_authority_id}
+            yield "/api/aadf/?" + urlencode(params)
+        elif route == "local_authority_list":
+            yield "/api/by-direction/local-authority/"
+        elif route == "road_list":
+            params = {"local_authority_id": local_authority_id}
+            yield "/api/by-direction/road/?" + urlencode(params)
+        elif route == "year_list":
+            yield "/api/by-direction/year/"
+        elif route == "ward_list":
+            params = {"detail": "low", "page": rng.randint(1, 5)}
+            yield "/api/ward/?" + urlencode(params)
+
+
+def connect(base_url, timeout):
+    url = urlsplit(base_url)
+    cls = (
+        http.client.HTTPSConnection
+        if url.scheme == "https"
+        else http.client.HTTPConnection
+    )
+    return cls(url.netloc, timeout=timeout)
+
+
+class Stage:
+    """
+    Results of running at one level of concurrency.
+    """
+
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self.timings = []
+        self.statuses = {}
+        self.errors = 0
+        self.bytes = 0
+        self.duration = 0
+        self.statements = None
+        self._lock = threading.Lock()
+
+    def record(self, timing, status, size):
+        with self._lock:
+            self.timings.append(timing)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self.bytes += size
+            # 304s are fine, anything else outside 2xx isn't
+            if status is None or not (200 <= status < 300 or status == 304):
+                self.errors += 1
+
+    @property
+    def requests(self):
+        return len(self.timings)
+
+    @property
+    def throughput(self):
+        return self.requests / self.duration if self.duration else 0
+
+    @property
+    def error_rate(self):
+        return self.errors / self.requests if self.requests else 0
+
+    def latency(self, pct):
+        """
+        Percentile of response times, in milliseconds.
+        """
+        if not self.timings:
+            return 0
+        return percentile(self.timings, pct) * 1000
+
+    def as_dict(self):
+        return {
+            "concurrency": self.concurrency,
+            "requests": self.requests,
+            "duration": self.duration,
+            "throughput": self.throughput,
+            "p50": self.latency(50),
+            "p95": self.latency(95),
+            "p99": self.latency(99),
+            "error_rate": self.error_rate,
+            "statuses": {str(k): v for k, v in self.statuses.items()},
+            "bytes": self.bytes,
+            "statements": self.statements,
+        }
+
+
+def run_stage(base_url, requests, concurrency, duration, timeout):
+    """
+    Send requests (paths, from the shared `requests` iterator) with
+    `concurrency` threads for `duration` seconds.
+    """
+    stage = Stage(concurrency)
+    requests_lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    headers = {"Accept-Encoding": "gzip", "User-Agent": "roadtrafficapi-load"}
+
+    def worker():
+        connection = connect(base_url, timeout)
+        try:
+            while time.monotonic() < deadline:
+                with requests_lock:
+                    path = next(requests)
+
+                start = time.perf_counter()
+                try:
+                    connection.request("GET", path, headers=headers)
+                    response = connection.getresponse()
+                    size = len(response.read())
+                    status = response.status
+                except (OSError, http.client.HTTPException):
+                    # Reconnect for the next request
+                    connection.close()
+                    size = 0
+                    status = None
+                stage.record(time.perf_counter() - start, status, size)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stage.duration = time.monotonic() - start
+
+    return stage
+
+
+class StatementStats:
+    """
+    Snapshots of `pg_stat_statements`, to see which queries a stage spent
+    its database time on.
+
+    Needs the extension installed in the API's database (and
+    `pg_stat_statements` in `shared_preload_libraries`), otherwise
+    `available` is False and snapshots are empty.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.query = None
+        try:
+            with engine.connect() as connection:
+                columns = {
+                    row[0] for row in connection.execute(text(COLUMNS_QUERY))
+                }
+        except Exception:
+            # Can't even connect, so there's nothing to report
+            columns = set()
+
+        if "total_exec_time" in columns:
+            self.query = STATEMENTS_QUERY.format(total="total_exec_time")
+        elif "total_time" in columns:
+            self.query = STATEMENTS_QUERY.format(total="total_time")
+
+    @property
+    def available(self):
+        return self.query is not None
+
+    def snapshot(self):
+        if not self.available:
+            return {}
+
+        with self.engine.connect() as connection:
+            return {
+                row.queryid: (row.query, row.calls, row.total_time)
+                for row in connection.execute(text(self.query))
+            }
+
+    def diff(self, before, after, top=5):
+        """
+        The `top` statements by database time between two snapshots, as
+        dicts of query, calls and total/mean time in milliseconds.
+        """
+        statements = []
+        for queryid, (query, calls, total_time) in after.items():
+            _, calls_before, total_time_before = before.get(
+                queryid, (query, 0, 0)
+            )
+            calls -= calls_before
+            total_time -= total_time_before
+            if calls > 0:
+                statements.append(
+                    {
+                        "query": " ".join(query.split()),
+                        "calls": calls,
+                        "total_time": total_time,
+                        "mean_time": total_time / calls,
+                    }
+                )
+
+        statements.sort(key=lambda s: s["total_time"], reverse=True)
+        return statements[:top]
+
+
+def load_test(
+    base_url,
+    requests,
+    concurrency_levels,
+    duration,
+    timeout=30,
+    statement_stats=None,
+    top=5,
+):
+    """
+    Ramp up through `concurrency_levels`, running each for `duration`
+    seconds. Yields a `Stage` as each one finishes.
+
+    `requests` is an iterator of paths (see `replay` and `route_mix`), shared
+    across the stages. If `statement_stats` (a `StatementStats`) is given,
+    each stage gets the `top` statements it spent database time on.
+    """
+    for concurrency in concurrency_levels:
+        before = statement_stats.snapshot() if statement_stats else None
+        stage = run_stage(base_url, requests, concurrency, duration, timeout)
+        if statement_stats and statement_stats.available:
+            stage.statements = statement_stats.diff(
+                before, statement_stats.snapshot(), top
+            )
+        yield stage
+
+
+def report(stage):
+    """
+    Lines summarising a stage.
+    """
+    yield (
+        f"{stage.concurrency:>4} concurrent: {stage.requests} requests, "
+        f"{stage.throughput:.1f} req/s, "
+        f"p50 {stage.latency(50):.1f}ms, "
+        f"p95 {stage.latency(95):.1f}ms, "
+        f"p99 {stage.latency(99):.1f}ms, "
+        f"errors {stage.error_rate:.2%}"
+    )
+
+    if stage.statements:
+        total_time = sum(s["total_time"] for s in stage.statements)
+        yield (
+            f"      top queries: {total_time:.0f}ms of database time, "
+            f"{total_time / stage.requests if stage.requests else 0:.2f}ms "
+            "per request"
+        )
+        for statement in stage.statements:
+            yield (
+                f"      {statement['calls']:>7} calls, "
+                f"{statement['total_time']:>9.0f}ms, "
+                f"mean {statement['mean_time']:.2f}ms: "
+                f"{statement['query'][:80]}"
+            )
+
+
+def saturation(stages, threshold=0.1):
+    """
+    The stage after which adding concurrency stopped raising throughput by
+    more than `threshold` (a fraction), i.e. roughly where the API saturates.
+    None if throughput kept climbing.
+    """
+    for previous, stage in zip(stages, stages[1:]):
+        if stage.throughput < previous.throughput * (1 + threshold):
+            return previous
+    return None
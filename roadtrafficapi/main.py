@@ -1,36 +1,388 @@
 import click
-from flask import Flask, redirect, request
-from flask_apispec import FlaskApiSpec, doc, marshal_with, use_kwargs
+from flask import Flask, abort, jsonify, redirect, request, stream_with_context
+from flask_apispec import doc, marshal_with, use_kwargs
 from flask_migrate import Migrate
-from flask_sqlalchemy import SQLAlchemy
-from webargs import fields
-
-from . import create_app
-from .importers import import_aadf_by_direction
-from .models import AADFByDirection, Ward
+from flask_sqlalchemy import Pagination, SQLAlchemy
+from sqlalchemy import and_, exists, false, func
+from webargs import fields, validate
+
+from . import (
+    analytics,
+    compression_cache,
+    create_app,
+    dataset_versions,
+    db,
+    geojson,
+    http_cache,
+    import_queue,
+    result_cache,
+    spatial_index,
+)
+from .analytics import VEHICLE_COLUMNS
+from .cache import LRUCache
+from .docs import LazyFlaskApiSpec
+from .jobs import FAILED, STATUSES
+from .models import (
+    AADF,
+    AADFByDirection,
+    DatasetVersion,
+    ImportJob,
+    RawCount,
+    Ward,
+    WardSimplified,
+    WardSubdivision,
+)
 from .schemas import (
+    import_job_schema,
     list_aadf_by_direction_schema,
+    list_aadf_schema,
+    list_dataset_version_schema,
     list_estimation_method_schema,
+    list_import_job_schema,
     list_local_authority_schema,
+    list_raw_count_schema,
     list_region_schema,
     list_road_schema,
     list_road_type_schema,
     list_ward_schema,
+    list_ward_without_geom_schema,
     list_year_schema,
 )
 
 app = create_app()
 
 
+IMPORT_OPTIONS = [
+    click.option(
+        "--file",
+        "path",
+        type=click.Path(exists=True, dir_okay=False),
+        help="Import from a local CSV rather than downloading from DfT.",
+    ),
+    click.option(
+        "--max-invalid",
+        type=click.FloatRange(0, 1),
+        help="Fraction of rows which can fail validation before giving up. "
+        "Defaults to IMPORT_MAX_INVALID.",
+    ),
+    click.option(
+        "--rejects",
+        "rejects_path",
+        type=click.Path(dir_okay=False),
+        help="Where to write rows which fail validation. Defaults to a file "
+        "in IMPORT_REJECTS_DIR.",
+    ),
+]
+
+
+def import_options(f):
+    for option in reversed(IMPORT_OPTIONS):
+        f = option(f)
+    return f
+
+
+@app.cli.command("import-dataset")
+@click.argument("dataset", type=click.Choice(import_queue.datasets))
+@click.argument("local_authority_id", type=int)
+@import_options
+def cmd_import_dataset(
+    dataset, local_authority_id, path, max_invalid, rejects_path
+):
+    """
+    Import a dataset for a specific local authority.
+
+    See https://roadtraffic.dft.gov.uk/local-authorities/ for IDs.
+    """
+    # Imported here to keep the app itself quick to start up
+    from .importers import (
+        MissingColumnsError,
+        TooManyInvalidRowsError,
+        import_dataset,
+    )
+
+    try:
+        result = import_dataset(
+            dataset,
+            local_authority_id,
+            path,
+            max_invalid=max_invalid,
+            rejects_path=rejects_path,
+        )
+    except (MissingColumnsError, TooManyInvalidRowsError) as e:
+        raise click.ClickException(str(e))
+
+    click.echo(f"Imported {result.rows_inserted} rows")
+    if result.rows_rejected:
+        click.echo(
+            f"Skipped {result.rows_rejected} invalid rows, see "
+            f"{result.rejects_path}"
+        )
+
+
 @app.cli.command("import-aadf-by-direction")
-@click.argument("local_authority_id")
-def cmd_import_aadf_by_direction(local_authority_id):
+@click.argument("local_authority_id", type=int)
+@import_options
+@click.pass_context
+def cmd_import_aadf_by_direction(ctx, local_authority_id, **kwargs):
     """
     Import AADF By Direction data for a specific local authority.
 
-    See https://roadtraffic.dft.gov.uk/local-authorities/ for IDs.
+    Same as `import-dataset aadf_by_direction`.
+    """
+    ctx.invoke(
+        cmd_import_dataset,
+        dataset="aadf_by_direction",
+        local_authority_id=local_authority_id,
+        **kwargs,
+    )
+
+
+@app.cli.command("enqueue-import")
+@click.argument("local_authority_id", type=int)
+@click.option(
+    "--dataset",
+    type=click.Choice(import_queue.datasets),
+    default="aadf_by_direction",
+    show_default=True,
+)
+@click.option(
+    "--file",
+    "path",
+    type=click.Path(exists=True, dir_okay=False, resolve_path=True),
+    help="Import from a local CSV rather than downloading from DfT. Must be "
+    "readable by the workers.",
+)
+def cmd_enqueue_import(local_authority_id, dataset, path):
     """
-    import_aadf_by_direction(local_authority_id)
+    Queue an import of a dataset, to be run by `import-worker`.
+    """
+    job = import_queue.enqueue(dataset, local_authority_id, path)
+    click.echo(f"Queued job {job.id}")
+
+
+@app.cli.command("import-worker")
+@click.option(
+    "--poll-interval",
+    default=5.0,
+    show_default=True,
+    help="Seconds to wait between checking for new jobs.",
+)
+@click.option("--once", is_flag=True, help="Stop once the queue is empty.")
+def cmd_import_worker(poll_interval, once):
+    """
+    Run queued imports.
+
+    Run as many as you like, IMPORT_CONCURRENCY limits how many imports run
+    at once.
+    """
+    import logging
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s"
+    )
+    import_queue.work(poll_interval, once)
+
+
+@app.cli.command("import-wards")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--srid",
+    default=4326,
+    show_default=True,
+    help="SRID of the file's coordinates, e.g. 27700 for British National "
+    "Grid.",
+)
+@click.option("--batch-size", default=500, show_default=True)
+def cmd_import_wards(path, srid, batch_size):
+    """
+    Import wards from a shapefile (.shp) or GeoJSON file.
+
+    Replaces all existing wards. See README.md for where to get them.
+    """
+    from .importers import import_wards
+
+    import_wards(path, srid, batch_size)
+
+
+@app.cli.command("build-spatial-index")
+def cmd_build_spatial_index():
+    """
+    Build the count point spatial index at SPATIAL_INDEX_PATH.
+
+    Imports rebuild it automatically, so only needed the first time.
+    """
+    if not spatial_index.path:
+        raise click.ClickException("SPATIAL_INDEX_PATH is not set")
+
+    spatial_index.rebuild()
+    click.echo(f"Indexed {spatial_index.index.count} count points")
+
+
+@app.cli.command("benchmark-spatial-index")
+@click.option("--queries", default=200, show_default=True)
+@click.option("--distance", default=1000.0, show_default=True)
+@click.option("--seed", type=int)
+def cmd_benchmark_spatial_index(queries, distance, seed):
+    """
+    Compare radius searches using the spatial index against PostGIS.
+    """
+    from .benchmarks import benchmark_spatial_index
+
+    if not spatial_index.enabled:
+        raise click.ClickException("Build the spatial index first")
+
+    for line in benchmark_spatial_index(queries, distance, seed):
+        click.echo(line)
+
+
+@app.cli.command("load-test")
+@click.argument("base_url", default="http://localhost:5000")
+@click.option(
+    "--log",
+    "log_path",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Replay requests from an access log (or file of one path per "
+    "line) rather than a mix of routes.",
+)
+@click.option(
+    "--concurrency",
+    default="1,2,4,8,16,32",
+    show_default=True,
+    help="Comma separated concurrency levels to ramp through.",
+)
+@click.option(
+    "--duration",
+    default=30.0,
+    show_default=True,
+    help="Seconds to run each concurrency level for.",
+)
+@click.option("--timeout", default=30.0, show_default=True)
+@click.option("--seed", type=int)
+@click.option(
+    "--top",
+    default=5,
+    show_default=True,
+    help="Number of pg_stat_statements queries to show per level.",
+)
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Also write the results as JSON, e.g. to compare with later runs.",
+)
+def cmd_load_test(
+    base_url, log_path, concurrency, duration, timeout, seed, top, output
+):
+    """
+    Ramp up traffic against a running instance of the API at BASE_URL.
+
+    Database stats come from pg_stat_statements in this app's database, so
+    point both at the same one.
+    """
+    import json
+
+    from . import loadtest
+
+    try:
+        levels = [int(level) for level in concurrency.split(",")]
+    except ValueError:
+        raise click.BadParameter(
+            "must be comma separated numbers", param_hint="--concurrency"
+        )
+
+    if log_path:
+        paths = loadtest.read_log(log_path)
+        if not paths:
+            raise click.ClickException(f"No requests found in {log_path}")
+        requests = loadtest.replay(paths)
+        click.echo(f"Replaying {len(paths)} logged requests")
+    else:
+        try:
+            values = loadtest.discover(base_url, timeout)
+        except (OSError, RuntimeError) as e:
+            raise click.ClickException(str(e))
+        requests = loadtest.route_mix(values, seed)
+        click.echo(
+            f"Mixing routes across {len(values['local_authority_ids'])} "
+            "local authorities"
+        )
+
+    statement_stats = loadtest.StatementStats(db.engine)
+    if not statement_stats.available:
+        click.echo("pg_stat_statements isn't available, no database stats")
+
+    stages = []
+    for stage in loadtest.load_test(
+        base_url, requests, levels, duration, timeout, statement_stats, top
+    ):
+        stages.append(stage)
+        for line in loadtest.report(stage):
+            click.echo(line)
+
+    saturated = loadtest.saturation(stages)
+    if saturated is not None:
+        click.echo(
+            f"Throughput stopped scaling after {saturated.concurrency} "
+            f"concurrent requests ({saturated.throughput:.1f} req/s)"
+        )
+
+    if output:
+        with open(output, "w") as f:
+            json.dump([stage.as_dict() for stage in stages], f, indent=2)
+
+
+@app.cli.command("export-analytics-snapshot")
+def cmd_export_analytics_snapshot():
+    """
+    Export a columnar snapshot of all data for the analytics endpoints.
+
+    Writes to ANALYTICS_SNAPSHOT_PATH. Run after importing data.
+    """
+    if not analytics.path:
+        raise click.ClickException("ANALYTICS_SNAPSHOT_PATH is not set")
+
+    click.echo(analytics.export())
+
+
+@app.cli.command("generate-synthetic-data")
+@click.argument("output_dir", type=click.Path(file_okay=False))
+@click.option("--local-authorities", default=10, show_default=True)
+@click.option(
+    "--count-points",
+    default=200,
+    show_default=True,
+    help="Count points per local authority.",
+)
+@click.option("--first-year", default=2000, show_default=True)
+@click.option("--last-year", default=2018, show_default=True)
+@click.option("--first-local-authority-id", default=9000, show_default=True)
+@click.option("--seed", type=int, help="Seed to make output repeatable.")
+def cmd_generate_synthetic_data(
+    output_dir,
+    local_authorities,
+    count_points,
+    first_year,
+    last_year,
+    first_local_authority_id,
+    seed,
+):
+    """
+    Generate synthetic AADF By Direction CSVs and wards for scale testing.
+
+    Import the CSVs with `import-aadf-by-direction <id> --file <csv>` and the
+    wards with `import-wards <output_dir>/wards.geojson`.
+    """
+    from .synthetic import generate as generate_synthetic_data
+
+    paths = generate_synthetic_data(
+        output_dir,
+        local_authorities=local_authorities,
+        count_points=count_points,
+        years=range(first_year, last_year + 1),
+        first_local_authority_id=first_local_authority_id,
+        seed=seed,
+    )
+    for path in paths:
+        click.echo(path)
 
 
 def generate_pagination_meta(pagination):
@@ -60,11 +412,61 @@ def generate_response(data, pagination, query=None):
     return out
 
 
+def geojson_response(q, feature, page, per_page, query=None):
+    """
+    Helper function to stream a page of results as a GeoJSON
+    FeatureCollection, with the same `meta` and `query` as other responses.
+
+    `feature` is the SQL expression building each feature, see
+    `geojson.feature`. `q` must be ordered, so pages don't overlap or skip
+    rows.
+    """
+    page = page or 1
+    pagination = Pagination(None, page, per_page, q.order_by(None).count(), [])
+
+    features = (
+        q.with_entities(feature)
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+        .execution_options(stream_results=True)
+        .yield_per(100)
+    )
+    body = geojson.feature_collection(
+        (text for text, in features),
+        **generate_pagination_meta(pagination),
+        query=query,
+    )
+
+    return app.response_class(
+        stream_with_context(body), mimetype=geojson.MIMETYPE
+    )
+
+
+# Optional params for endpoints which can output GeoJSON
+geojson_args = {
+    "format": fields.String(
+        location="query",
+        required=False,
+        validate=validate.OneOf(["json", "geojson"]),
+    ),
+    "precision": fields.Int(
+        location="query",
+        required=False,
+        validate=validate.Range(min=0, max=15),
+    ),
+}
+
+
 @app.route("/")
 def home():
     return redirect("/api/", 302)
 
 
+# Coordinates are rounded to this many decimal places (roughly 1m) for
+# spatial searches, so nearby requests share cache entries.
+COORDINATE_PRECISION = 5
+
+
 aadf_by_direction_list_desc = """
 # Example
 To show records for counts of vehicles going North in 2018, within 3km of Exeter:
@@ -94,6 +496,12 @@ has been imported, allowing you to find AADF By Direction records within Wards.
 
 Use the optional `ward_gid` param to do this.
 
+## GeoJSON
+
+Use `format=geojson` to get a GeoJSON FeatureCollection (as
+`application/geo+json`) instead, with a Point feature per record. Coordinates
+have 6 decimal places, use the `precision` param to change that.
+
 # Pagination
 
 Results are paginated, showing 1,000 records per page.
@@ -138,15 +546,38 @@ response to know how many pages (and total results) there are.
 @use_kwargs({"latitude": fields.Float(location="query", required=False)})
 @use_kwargs({"distance": fields.Float(location="query", required=False)})
 @use_kwargs({"ward_gid": fields.Int(location="query", required=False)})
+@use_kwargs(geojson_args)
 def aadf_by_direction_list(**kwargs):
     """
     List all AADF By Direction records.
     """
     per_page = 1000
 
+    for name in ("longitude", "latitude"):
+        if kwargs.get(name) is not None:
+            kwargs[name] = round(kwargs[name], COORDINATE_PRECISION)
+
     # Only used for annotating response
     query_params = {**kwargs}
 
+    output_format = kwargs.pop("format", "json")
+    precision = kwargs.pop("precision", geojson.DEFAULT_PRECISION)
+
+    if output_format == "json":
+        # Results for a single local authority only need dropping from the
+        # cache when that local authority is reimported.
+        depends = [("aadf_by_direction", kwargs.get("local_authority_id"))]
+        if kwargs.get("ward_gid"):
+            depends.append(("wards", None))
+        if kwargs.get("longitude") and kwargs.get("latitude"):
+            depends.append(("spatial_index", None))
+        cache_key = result_cache.key(
+            "aadf_by_direction", query_params, depends
+        )
+        body = result_cache.get(cache_key)
+        if body is not None:
+            return app.response_class(body, mimetype="application/json")
+
     # Some args we need to do some processing on, so pop them out.
     # The rest of kwargs is used to populate the `filter_by`
     page = kwargs.pop("page", None)
@@ -161,7 +592,15 @@ def aadf_by_direction_list(**kwargs):
     q = AADFByDirection.query
 
     # Find AADF records by longitude and latitude, with a configurable distance
-    if longitude and latitude:
+    if longitude and latitude and spatial_index.enabled:
+        # Much quicker to find nearby count points in memory, then fetch their
+        # records by (indexed) ID.
+        count_point_ids = spatial_index.radius(longitude, latitude, distance)
+        if count_point_ids:
+            q = q.filter(AADFByDirection.count_point_id.in_(count_point_ids))
+        else:
+            q = q.filter(false())
+    elif longitude and latitude:
         q = q.filter(
             AADFByDirection.point.ST_Distance_Sphere(
                 f"SRID=4326;POINT({longitude} {latitude})"
@@ -172,11 +611,31 @@ def aadf_by_direction_list(**kwargs):
     # Unpack the rest of the query params into the filter
     q = q.filter_by(**kwargs)
 
-    # Spatial join based on the Ward ID.
+    # Spatial filter based on the Ward ID. Checks against the ward's
+    # subdivided geometry, which is much quicker than the full thing.
+    # Intersects rather than contains, as points on the boundary between two
+    # pieces aren't contained by either.
     if ward_gid:
-        # This might be better as a relationship rather than using an ON clause
-        q = q.join(Ward, Ward.geom.ST_Contains(AADFByDirection.point))
-        q = q.filter(Ward.gid == ward_gid)
+        q = q.filter(
+            exists().where(
+                and_(
+                    WardSubdivision.ward_gid == ward_gid,
+                    WardSubdivision.geom.ST_Intersects(AADFByDirection.point),
+                )
+            )
+        )
+
+    if output_format == "geojson":
+        feature = geojson.feature(
+            AADFByDirection.__table__,
+            AADFByDirection.id,
+            AADFByDirection.point,
+            precision,
+            exclude=["id", "point"],
+        )
+        # Pages are fetched with LIMIT/OFFSET, so need a stable order
+        q = q.order_by(AADFByDirection.id)
+        return geojson_response(q, feature, page, per_page, query_params)
 
     # Throw the built up query into the paginator
     pagination = q.paginate(page, per_page, False)
@@ -185,7 +644,10 @@ def aadf_by_direction_list(**kwargs):
 
     data = list_aadf_by_direction_schema.dump(all_aadf_by_directions)
 
-    return generate_response(data, pagination, query_params)
+    response = jsonify(generate_response(data, pagination, query_params))
+    result_cache.set(cache_key, response.get_data())
+
+    return response
 
 
 @app.route("/api/by-direction/year/", methods=["GET"])
@@ -335,22 +797,601 @@ def estimation_method_list(**kwargs):
     return generate_response(all_estimation_methods, pagination)
 
 
+# Filters shared by every dataset's list
+count_point_filters = {
+    "count_point_id": fields.Int(location="query", required=False),
+    "year": fields.String(location="query", required=False),
+    "local_authority_id": fields.Int(location="query", required=False),
+    "local_authority_name": fields.String(location="query", required=False),
+    "region_id": fields.Int(location="query", required=False),
+    "region_name": fields.String(location="query", required=False),
+    "road_name": fields.String(location="query", required=False),
+    "road_type": fields.String(location="query", required=False),
+}
+
+
+def count_point_list(name, model, schema, kwargs):
+    """
+    Paginated list of a dataset's records, filtered by `kwargs` (column names
+    and values) and cached like the by-direction list.
+    """
+    per_page = 1000
+
+    # Only used for annotating response
+    query_params = {**kwargs}
+
+    depends = [(name, kwargs.get("local_authority_id"))]
+    cache_key = result_cache.key(name, query_params, depends)
+    body = result_cache.get(cache_key)
+    if body is not None:
+        return app.response_class(body, mimetype="application/json")
+
+    page = kwargs.pop("page")
+    pagination = (
+        model.query.filter_by(**kwargs)
+        .order_by(model.id)
+        .paginate(page, per_page, False)
+    )
+
+    data = schema.dump(pagination.items)
+
+    response = jsonify(generate_response(data, pagination, query_params))
+    result_cache.set(cache_key, response.get_data())
+
+    return response
+
+
+@app.route("/api/aadf/", methods=["GET"])
+@doc(
+    summary="Paginated list of AADF records with optional filters",
+    description="""
+Annual average daily flow at each count point, for both directions of travel
+combined. Filters are the same as for `/api/by-direction/`, except there's no
+`direction_of_travel`.
+
+Import with `flask import-dataset aadf LOCAL_AUTHORITY_ID`.
+""",
+)
+@use_kwargs({"page": fields.Int(location="query", required=False, missing=1)})
+@use_kwargs(count_point_filters)
+@use_kwargs(
+    {"estimation_method": fields.String(location="query", required=False)}
+)
+@use_kwargs(
+    {
+        "estimation_method_detailed": fields.String(
+            location="query", required=False
+        )
+    }
+)
+def aadf_list(**kwargs):
+    """
+    List all AADF records.
+    """
+    return count_point_list("aadf", AADF, list_aadf_schema, kwargs)
+
+
+@app.route("/api/raw-counts/", methods=["GET"])
+@doc(
+    summary="Paginated list of raw count records with optional filters",
+    description="""
+Vehicles counted at each count point, per direction and hour of the count
+day. Filter on the day with `count_date` (YYYY-MM-DD), and the hour it
+started with `hour` (7 to 18).
+
+Import with `flask import-dataset raw_counts LOCAL_AUTHORITY_ID`.
+""",
+)
+@use_kwargs({"page": fields.Int(location="query", required=False, missing=1)})
+@use_kwargs(count_point_filters)
+@use_kwargs(
+    {"direction_of_travel": fields.String(location="query", required=False)}
+)
+@use_kwargs({"count_date": fields.Date(location="query", required=False)})
+@use_kwargs({"hour": fields.Int(location="query", required=False)})
+def raw_count_list(**kwargs):
+    """
+    List all raw count records.
+    """
+    return count_point_list(
+        "raw_counts", RawCount, list_raw_count_schema, kwargs
+    )
+
+
 @app.route("/api/ward/", methods=["GET"])
+@doc(
+    description="""
+Use `detail` to get simplified geometry (`medium` or `low`) rather than the
+`full` boundaries, which are much bigger.
+
+Use `format=geojson` to get a GeoJSON FeatureCollection instead, with
+coordinates to `precision` (default 6) decimal places.
+"""
+)
 @use_kwargs({"page": fields.Int(location="query", required=False, missing=1)})
+@use_kwargs(
+    {
+        "detail": fields.String(
+            location="query",
+            required=False,
+            missing="full",
+            validate=validate.OneOf(["full", "medium", "low"]),
+        )
+    }
+)
+@use_kwargs(geojson_args)
 def ward_list(**kwargs):
     """
     List all wards.
     """
     page = kwargs["page"]
+    detail = kwargs["detail"]
     per_page = 100
 
+    if kwargs.get("format") == "geojson":
+        q = Ward.query.order_by(Ward.gid)
+        geom = Ward.geom
+        if detail != "full":
+            q = q.outerjoin(
+                WardSimplified,
+                and_(
+                    WardSimplified.ward_gid == Ward.gid,
+                    WardSimplified.detail == detail,
+                ),
+            )
+            geom = WardSimplified.geom
+
+        feature = geojson.feature(
+            Ward.__table__,
+            Ward.gid,
+            geom,
+            kwargs.get("precision", geojson.DEFAULT_PRECISION),
+            exclude=["geom"],
+        )
+        return geojson_response(q, feature, page, per_page)
+
     pagination = Ward.query.order_by(Ward.gid).paginate(page, per_page, False)
-    all_wards = list_ward_schema.dump(pagination.items)
+
+    if detail == "full":
+        all_wards = list_ward_schema.dump(pagination.items)
+    else:
+        from geoalchemy2.shape import to_shape
+
+        # Swap in the precomputed simplified geometry
+        all_wards = list_ward_without_geom_schema.dump(pagination.items)
+        simplified = dict(
+            db.session.query(WardSimplified.ward_gid, WardSimplified.geom)
+            .filter(
+                WardSimplified.ward_gid.in_([w["gid"] for w in all_wards]),
+                WardSimplified.detail == detail,
+            )
+            .all()
+        )
+        for ward in all_wards:
+            geom = simplified.get(ward["gid"])
+            ward["geom"] = str(to_shape(geom)) if geom is not None else None
 
     return generate_response(all_wards, pagination)
 
 
-docs = FlaskApiSpec(app)
+# Recent ward lookups, keyed on rounded coordinates. Popular spots (town
+# centres etc) get looked up over and over.
+ward_lookup_cache = LRUCache(10000, sizeof=lambda _: 1)
+
+
+@app.route("/api/ward/lookup/", methods=["GET"])
+@doc(
+    summary="Find the ward containing a point, and the nearest count points",
+    description="""
+# Example
+Which ward is Exeter Cathedral in, and which count points are nearest?
+
+    /api/ward/lookup/?longitude=-3.5300&latitude=50.7226
+
+`ward` is `null` if the point isn't in any ward (e.g. it's out at sea).
+
+Use the optional `count_points` param to control how many of the nearest count
+points are returned (default 5, max 100). Use the `count_point_id` of each with
+`/api/by-direction/` to get their traffic.
+""",
+)
+@use_kwargs({"longitude": fields.Float(location="query", required=True)})
+@use_kwargs({"latitude": fields.Float(location="query", required=True)})
+@use_kwargs(
+    {
+        "count_points": fields.Int(
+            location="query",
+            required=False,
+            missing=5,
+            validate=validate.Range(min=0, max=100),
+        )
+    }
+)
+def ward_lookup(**kwargs):
+    """
+    Reverse geocode a point to a ward.
+    """
+    longitude = round(kwargs["longitude"], COORDINATE_PRECISION)
+    latitude = round(kwargs["latitude"], COORDINATE_PRECISION)
+    k = kwargs["count_points"]
+
+    key = (longitude, latitude, k, dataset_versions.current())
+    data = ward_lookup_cache.get(key)
+    if data is None:
+        data = {
+            "ward": find_ward(longitude, latitude),
+            "count_points": find_nearest_count_points(longitude, latitude, k),
+        }
+        ward_lookup_cache.set(key, data)
+
+    pagination = Pagination(
+        None, 1, k, len(data["count_points"]), data["count_points"]
+    )
+
+    return generate_response(data, pagination, kwargs)
+
+
+def find_ward(longitude, latitude):
+    """
+    Ward containing a point, using the (GiST indexed) subdivided geometry.
+    """
+    point = f"SRID=4326;POINT({longitude} {latitude})"
+    ward = (
+        db.session.query(
+            Ward.gid, Ward.wd16cd, Ward.wd16nm, Ward.lad16cd, Ward.lad16nm
+        )
+        .join(WardSubdivision, WardSubdivision.ward_gid == Ward.gid)
+        .filter(WardSubdivision.geom.ST_Intersects(point))
+        .first()
+    )
+    return ward._asdict() if ward is not None else None
+
+
+# Rows fetched per count point wanted when finding the nearest with PostGIS.
+# Each count point has a row per year and direction, so a generous number of
+# the nearest rows is needed to be sure of getting enough count points.
+NEAREST_ROWS_PER_COUNT_POINT = 100
+
+
+def find_nearest_count_points(longitude, latitude, k):
+    """
+    The `k` nearest count points, closest first.
+
+    Uses the spatial index if available, otherwise falls back to PostGIS.
+    """
+    if not k:
+        return []
+
+    columns = [
+        AADFByDirection.count_point_id,
+        AADFByDirection.road_name,
+        AADFByDirection.road_type,
+        AADFByDirection.local_authority_id,
+        AADFByDirection.local_authority_name,
+        AADFByDirection.longitude,
+        AADFByDirection.latitude,
+    ]
+
+    if spatial_index.enabled:
+        distances = {
+            count_point_id: distance
+            for distance, count_point_id in spatial_index.nearest(
+                longitude, latitude, k
+            )
+        }
+        count_points = (
+            db.session.query(*columns)
+            .filter(AADFByDirection.count_point_id.in_(distances))
+            .distinct(AADFByDirection.count_point_id)
+            .order_by(AADFByDirection.count_point_id)
+        )
+        out = [
+            {
+                **count_point._asdict(),
+                "distance": distances[count_point.count_point_id],
+            }
+            for count_point in count_points
+        ]
+    else:
+        # KNN search (`<->`) using the GiST index, so only the nearest rows
+        # are read, then the spherical distance is worked out for just those.
+        origin = func.ST_SetSRID(func.ST_MakePoint(longitude, latitude), 4326)
+        nearest = (
+            db.session.query(*columns, AADFByDirection.point)
+            .order_by(AADFByDirection.point.op("<->")(origin))
+            .limit(k * NEAREST_ROWS_PER_COUNT_POINT)
+            .subquery()
+        )
+        distance = func.ST_Distance_Sphere(nearest.c.point, origin).label(
+            "distance"
+        )
+        sq = (
+            db.session.query(
+                *[nearest.c[column.key] for column in columns], distance
+            )
+            .distinct(nearest.c.count_point_id)
+            .order_by(nearest.c.count_point_id)
+            .subquery()
+        )
+        count_points = (
+            db.session.query(sq).order_by(sq.c.distance).limit(k).all()
+        )
+        out = [count_point._asdict() for count_point in count_points]
+
+    return sorted(out, key=lambda count_point: count_point["distance"])
+
+
+@app.route("/api/dataset-version/", methods=["GET"])
+@doc(
+    summary="When the data for each local authority was last changed",
+    description="""
+Every import of a local authority bumps its `version` and `modified_at`.
+
+Poll this to find out cheaply whether anything has changed since you last
+fetched data, rather than fetching everything again.
+""",
+)
+@use_kwargs({"page": fields.Int(location="query", required=False, missing=1)})
+@use_kwargs(
+    {"local_authority_id": fields.Int(location="query", required=False)}
+)
+def dataset_version_list(**kwargs):
+    """
+    List versions of all datasets, per local authority.
+    """
+    page = kwargs.pop("page")
+    per_page = 1000
+
+    pagination = (
+        DatasetVersion.query.filter_by(**kwargs)
+        .order_by(DatasetVersion.dataset, DatasetVersion.local_authority_id)
+        .paginate(page, per_page, False)
+    )
+    all_versions = list_dataset_version_schema.dump(pagination.items)
+
+    return generate_response(all_versions, pagination, kwargs)
+
+
+@app.route("/api/cache-stats/", methods=["GET"])
+@compression_cache.exempt
+@http_cache.exempt
+@doc(
+    summary="Hit/miss statistics for the API's in memory caches",
+    description="""
+Caches are per gunicorn worker, so these are for whichever worker happened to
+answer the request. `size` is in bytes for the compression and result caches,
+entries for the ward lookup cache.
+""",
+)
+def cache_stats_list():
+    """
+    Statistics for each cache.
+    """
+    caches = {
+        "compression": compression_cache.cache,
+        "result": result_cache.cache,
+        "ward_lookup": ward_lookup_cache,
+    }
+    data = [
+        {"cache": name, **cache.stats()}
+        for name, cache in caches.items()
+        if cache is not None
+    ]
+    pagination = Pagination(None, 1, len(data), len(data), data)
+
+    return generate_response(data, pagination)
+
+
+def require_import_jobs_token():
+    if not import_queue.config["IMPORT_JOBS_TOKEN"]:
+        abort(403, "Import jobs are only available from the command line")
+
+    token = None
+    authorization = request.headers.get("Authorization", "")
+    if authorization.startswith("Bearer "):
+        token = authorization[len("Bearer ") :]
+    if not import_queue.check_token(token):
+        abort(401)
+
+
+@app.route("/api/jobs/", methods=["POST"])
+@doc(
+    summary="Queue an import",
+    description="""
+Needs an `Authorization: Bearer <token>` header, with the token configured in
+`IMPORT_JOBS_TOKEN`.
+
+If an import of the same local authority is already waiting, that job is
+returned rather than queueing another.
+""",
+)
+@use_kwargs(
+    {
+        "local_authority_id": fields.Int(location="json", required=True),
+        "dataset": fields.String(
+            location="json",
+            required=False,
+            missing="aadf_by_direction",
+            validate=validate.OneOf(import_queue.datasets),
+        ),
+    }
+)
+def import_job_create(**kwargs):
+    """
+    Queue an import job.
+    """
+    require_import_jobs_token()
+
+    job = import_queue.enqueue(kwargs["dataset"], kwargs["local_authority_id"])
+    data = import_job_schema.dump(job)
+    pagination = Pagination(None, 1, 1, 1, [data])
+
+    return generate_response(data, pagination, kwargs), 202
+
+
+@app.route("/api/jobs/", methods=["GET"])
+@compression_cache.exempt
+@http_cache.exempt
+@doc(
+    summary="Import jobs, most recent first",
+    description="""
+Needs the same `Authorization` header as queueing an import, as jobs include
+tracebacks, paths and hostnames from the import workers.
+
+`rows_parsed` and `rows_inserted` are updated as a job runs, and
+`rows_per_second` gives its throughput.
+
+Failed jobs are retried automatically, until they've used up `max_attempts`.
+""",
+)
+@use_kwargs({"page": fields.Int(location="query", required=False, missing=1)})
+@use_kwargs(
+    {
+        "status": fields.String(
+            location="query", required=False, validate=validate.OneOf(STATUSES)
+        ),
+        "local_authority_id": fields.Int(location="query", required=False),
+    }
+)
+def import_job_list(**kwargs):
+    """
+    List import jobs.
+    """
+    require_import_jobs_token()
+
+    page = kwargs.pop("page")
+    per_page = 100
+
+    pagination = (
+        ImportJob.query.filter_by(**kwargs)
+        .order_by(ImportJob.id.desc())
+        .paginate(page, per_page, False)
+    )
+    all_jobs = list_import_job_schema.dump(pagination.items)
+
+    return generate_response(all_jobs, pagination, kwargs)
+
+
+@app.route("/api/jobs/<int:job_id>/", methods=["GET"])
+@compression_cache.exempt
+@http_cache.exempt
+@doc(
+    summary="Status and progress of an import job",
+    description="""
+Needs the same `Authorization` header as queueing an import.
+""",
+)
+def import_job_detail(job_id):
+    """
+    A single import job.
+    """
+    require_import_jobs_token()
+
+    job = ImportJob.query.get_or_404(job_id)
+    data = import_job_schema.dump(job)
+    pagination = Pagination(None, 1, 1, 1, [data])
+
+    return generate_response(data, pagination)
+
+
+@app.route("/api/jobs/<int:job_id>/retry/", methods=["POST"])
+@doc(
+    summary="Retry a failed import job",
+    description="""
+Needs the same `Authorization` header as queueing an import.
+""",
+)
+def import_job_retry(job_id):
+    """
+    Queue a failed import job to run again.
+    """
+    require_import_jobs_token()
+
+    job = ImportJob.query.get_or_404(job_id)
+    if job.status != FAILED:
+        abort(409, "Only failed jobs can be retried")
+
+    import_queue.retry(job)
+    data = import_job_schema.dump(job)
+    pagination = Pagination(None, 1, 1, 1, [data])
+
+    return generate_response(data, pagination), 202
+
+
+def require_analytics():
+    if not analytics.enabled:
+        abort(503, "Analytics snapshot has not been exported")
+
+
+analytics_filters = {
+    "region_id": fields.Int(location="query", required=False),
+    "local_authority_id": fields.Int(location="query", required=False),
+    "road_type": fields.String(location="query", required=False),
+}
+
+
+@app.route("/api/analytics/hgv-share/", methods=["GET"])
+@doc(
+    summary="Share of motor vehicles which are HGVs, per year",
+    description="""
+Totals `all_hgvs` and `all_motor_vehicles` across every count point matching
+the (optional) filters, for each year.
+""",
+)
+@use_kwargs(analytics_filters)
+def hgv_share_list(**kwargs):
+    """
+    HGV share of traffic per year.
+    """
+    require_analytics()
+
+    data = analytics.hgv_share(**kwargs)
+    pagination = Pagination(None, 1, len(data), len(data), data)
+
+    return generate_response(data, pagination, kwargs)
+
+
+@app.route("/api/analytics/road-ranking/", methods=["GET"])
+@doc(
+    summary="Count points ranked by traffic for a year",
+    description="""
+Busiest first, with both directions combined. `percentile` is the percentage
+of other count points with less traffic.
+
+Use `vehicle` to rank by a specific type of vehicle, rather than all motor
+vehicles.
+""",
+)
+@use_kwargs({"page": fields.Int(location="query", required=False, missing=1)})
+@use_kwargs({"year": fields.Int(location="query", required=True)})
+@use_kwargs(
+    {
+        "vehicle": fields.String(
+            location="query",
+            required=False,
+            missing="all_motor_vehicles",
+            validate=validate.OneOf(VEHICLE_COLUMNS),
+        )
+    }
+)
+@use_kwargs(analytics_filters)
+def road_ranking_list(**kwargs):
+    """
+    Count points ranked by traffic.
+    """
+    require_analytics()
+
+    page = kwargs.pop("page")
+    per_page = 1000
+
+    ranking = analytics.road_ranking(**kwargs)
+    items = ranking[(page - 1) * per_page : page * per_page]
+    pagination = Pagination(None, page, per_page, len(ranking), items)
+
+    return generate_response(items, pagination, kwargs)
+
+
+docs = LazyFlaskApiSpec(app)
 docs.register(aadf_by_direction_list)
 docs.register(year_list)
 docs.register(region_list)
@@ -359,7 +1400,22 @@ docs.register(road_list)
 docs.register(road_type_list)
 docs.register(estimation_method_list)
 
+docs.register(aadf_list)
+docs.register(raw_count_list)
+
 docs.register(ward_list)
+docs.register(ward_lookup)
+
+docs.register(dataset_version_list)
+docs.register(cache_stats_list)
+
+docs.register(import_job_create)
+docs.register(import_job_list)
+docs.register(import_job_detail)
+docs.register(import_job_retry)
+
+docs.register(hgv_share_list)
+docs.register(road_ranking_list)
 
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=5000)
@@ -1,4 +1,5 @@
 from geoalchemy2 import Geometry
+from sqlalchemy import func
 
 from . import db
 
@@ -12,8 +13,9 @@ class Ward(db.Model):
     Table structure defined by the `shp2pgsql` tool, which converts a .shp
     file into SQL CREATE TABLE and INSERT statements.
 
-    Model is not managed by alembic so does not have migrations. Instead create
-    table using the `shp2pgsql` tool as per: https://gis.stackexchange.com/questions/41799/adding-shapefiles-to-postgis-database
+    Model is not managed by alembic so does not have migrations. Instead the
+    table is created by `flask import-wards`, or previously by the `shp2pgsql`
+    tool as per: https://gis.stackexchange.com/questions/41799/adding-shapefiles-to-postgis-database
     """
 
     __tablename__ = "wards"
@@ -31,25 +33,52 @@ class Ward(db.Model):
     lat = db.Column(db.Numeric)
     st_areasha = db.Column(db.Numeric)
     st_lengths = db.Column(db.Numeric)
-    geom = db.Column(Geometry(geometry_type="MULTIPOLYGON", srid=4326))
+    # GiST index is created by `import-wards` (with IF NOT EXISTS), as tables
+    # made by `shp2pgsql` may or may not already have one.
+    geom = db.Column(
+        Geometry(geometry_type="MULTIPOLYGON", srid=4326, spatial_index=False)
+    )
 
 
-class AADFByDirection(db.Model):
+class WardSubdivision(db.Model):
     """
-    Represents a single row of the AADF By Direction data set.
+    A ward's geometry, chopped into small pieces with `ST_Subdivide`.
 
-    Data could potentially be normalised somewhat (separate models for regions
-    and local authorities), rather than dumping into a single model like this.
-    However doesn't present much benefit and just complicates things.
+    Ward boundaries can have thousands of vertices, making point in polygon
+    checks slow even when the GiST index narrows things down. Checking against
+    pieces with a handful of vertices each is much quicker.
 
-    If in the future more structure is needed, e.g. to store extra information
-    about a local authority, then this will likely need to be refactored.
+    Like `Ward`, not managed by alembic. Populated by `flask import-wards`.
     """
 
-    # There's not really a suitable ID in the AADF By Direction data. Choice
-    # is either use a compound key (count_pount_id, year, direction) or
-    # generate our own instead.
+    __tablename__ = "ward_subdivisions"
+
     id = db.Column(db.Integer, primary_key=True)
+    ward_gid = db.Column(db.Integer, nullable=False, index=True)
+    geom = db.Column(Geometry(srid=4326))
+
+
+class WardSimplified(db.Model):
+    """
+    Simplified versions of each ward's geometry, for when the full detail
+    isn't needed (e.g. drawing a map of the whole country).
+
+    Like `Ward`, not managed by alembic. Populated by `flask import-wards`.
+    """
+
+    __tablename__ = "ward_simplified"
+
+    ward_gid = db.Column(db.Integer, primary_key=True)
+    detail = db.Column(db.String(length=10), primary_key=True)
+    geom = db.Column(
+        Geometry(geometry_type="MULTIPOLYGON", srid=4326, spatial_index=False)
+    )
+
+
+class CountPointMixin:
+    """
+    Columns describing a count point, common to all of DfT's datasets.
+    """
 
     count_point_id = db.Column(db.Integer, nullable=False, index=True)
     year = db.Column(db.String(length=4), nullable=False, index=True)
@@ -72,7 +101,6 @@ class AADFByDirection(db.Model):
     northing = db.Column(db.Integer, nullable=False)
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
-    point = db.Column(Geometry(geometry_type="POINT", srid=4326), index=True)
 
     # Numeric (i.e. Decimal) fields slightly complicate things during
     # [de]serialisation in Marshmallow. See warning in docs for more info:
@@ -80,15 +108,11 @@ class AADFByDirection(db.Model):
     link_length_km = db.Column(db.Numeric(precision=2))
     link_length_miles = db.Column(db.Numeric(precision=2))
 
-    estimation_method = db.Column(
-        db.String(length=15), nullable=False, index=True
-    )
-    estimation_method_detailed = db.Column(
-        db.String(length=100), nullable=False, index=True
-    )
-    direction_of_travel = db.Column(
-        db.String(length=1), nullable=False, index=True
-    )
+
+class VehicleCountsMixin:
+    """
+    Number of each type of vehicle, common to all of DfT's datasets.
+    """
 
     pedal_cycles = db.Column(db.Integer, nullable=False)
     two_wheeled_motor_vehicles = db.Column(db.Integer, nullable=False)
@@ -103,3 +127,147 @@ class AADFByDirection(db.Model):
     hgvs_6_articulated_axle = db.Column(db.Integer, nullable=False)
     all_hgvs = db.Column(db.Integer, nullable=False)
     all_motor_vehicles = db.Column(db.Integer, nullable=False)
+
+
+class AADFByDirection(CountPointMixin, VehicleCountsMixin, db.Model):
+    """
+    Represents a single row of the AADF By Direction data set.
+
+    Data could potentially be normalised somewhat (separate models for regions
+    and local authorities), rather than dumping into a single model like this.
+    However doesn't present much benefit and just complicates things.
+
+    If in the future more structure is needed, e.g. to store extra information
+    about a local authority, then this will likely need to be refactored.
+
+    Partitioned by local authority, which is how it's imported: each import
+    swaps in a freshly loaded partition rather than deleting and inserting
+    rows, and queries filtering on `local_authority_id` only touch the one
+    partition. Partitions are created by the importer, anything else lands in
+    `aadf_by_direction_default`.
+    """
+
+    __table_args__ = {"postgresql_partition_by": "LIST (local_authority_id)"}
+
+    # There's not really a suitable ID in the AADF By Direction data. Choice
+    # is either use a compound key (count_pount_id, year, direction) or
+    # generate our own instead.
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+
+    # Primary keys of partitioned tables have to include the partition key
+    local_authority_id = db.Column(db.Integer, primary_key=True, index=True)
+
+    point = db.Column(Geometry(geometry_type="POINT", srid=4326), index=True)
+
+    estimation_method = db.Column(
+        db.String(length=15), nullable=False, index=True
+    )
+    estimation_method_detailed = db.Column(
+        db.String(length=100), nullable=False, index=True
+    )
+    direction_of_travel = db.Column(
+        db.String(length=1), nullable=False, index=True
+    )
+
+
+class AADF(CountPointMixin, VehicleCountsMixin, db.Model):
+    """
+    Represents a single row of the AADF (totals for both directions) data set.
+    """
+
+    __tablename__ = "aadf"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    point = db.Column(Geometry(geometry_type="POINT", srid=4326))
+
+    estimation_method = db.Column(
+        db.String(length=15), nullable=False, index=True
+    )
+    estimation_method_detailed = db.Column(
+        db.String(length=100), nullable=False, index=True
+    )
+
+
+class RawCount(CountPointMixin, VehicleCountsMixin, db.Model):
+    """
+    Represents a single row of the raw counts data set, i.e. vehicles counted
+    in one direction during one hour of a count day.
+    """
+
+    __tablename__ = "raw_counts"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    point = db.Column(Geometry(geometry_type="POINT", srid=4326))
+
+    direction_of_travel = db.Column(
+        db.String(length=1), nullable=False, index=True
+    )
+    count_date = db.Column(db.Date, nullable=False, index=True)
+    hour = db.Column(db.Integer, nullable=False)
+
+
+class DatasetVersion(db.Model):
+    """
+    Version of the data for a single local authority within a dataset.
+
+    Bumped every time the local authority's data is imported, so caches
+    (which are per gunicorn worker) can tell when they've gone stale.
+    """
+
+    __tablename__ = "dataset_versions"
+
+    dataset = db.Column(db.String(length=50), primary_key=True)
+    local_authority_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    modified_at = db.Column(
+        db.DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+
+class ImportJob(db.Model):
+    """
+    A queued (or running, or finished) import, run by `flask import-worker`.
+
+    See `jobs.py`.
+    """
+
+    __tablename__ = "import_jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    dataset = db.Column(db.String(length=50), nullable=False)
+    local_authority_id = db.Column(db.Integer, nullable=False)
+    # Local file to import from, rather than downloading from DfT
+    path = db.Column(db.Text)
+    # queued, running, succeeded or failed
+    status = db.Column(db.String(length=10), nullable=False, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    error = db.Column(db.Text)
+    rows_parsed = db.Column(db.Integer, nullable=False, default=0)
+    rows_inserted = db.Column(db.Integer, nullable=False, default=0)
+    rows_rejected = db.Column(db.Integer, nullable=False, default=0)
+    # CSV of rejected rows, with what's wrong with each
+    rejects_path = db.Column(db.Text)
+    # Hostname and PID of the worker running the job
+    worker = db.Column(db.String(length=100))
+    created_at = db.Column(
+        db.DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    # Not picked up before this, so retries back off
+    run_after = db.Column(
+        db.DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    started_at = db.Column(db.DateTime(timezone=True))
+    finished_at = db.Column(db.DateTime(timezone=True))
+    # Updated with progress, so jobs whose worker died can be spotted
+    heartbeat_at = db.Column(db.DateTime(timezone=True))
+
+    @property
+    def rows_per_second(self):
+        if self.started_at is None or self.heartbeat_at is None:
+            return None
+        end = self.finished_at or self.heartbeat_at
+        seconds = (end - self.started_at).total_seconds()
+        return self.rows_inserted / seconds if seconds > 0 else None
@@ -0,0 +1,95 @@
+"""
+Cache of serialised query results.
+
+Most traffic is the same few hundred filter combinations (popular local
+authorities, years, searches around city centres), so rather than re-running
+the query, count and Marshmallow dump every time, keep the serialised response
+body around.
+
+Unlike the compression cache (which is keyed on the overall dataset version,
+so is emptied by every import), entries here say which local authorities they
+depend on. Importing one local authority only drops the entries which could
+include its data.
+
+Keys include the versions of what they depend on too, as of before the query
+ran. So a result which was being worked out while an import committed is
+stored under the old versions, and never served once the new ones are known.
+"""
+
+from .cache import LRUCache
+
+
+class ResultCache:
+    """
+    `version` is called before making every key, to make sure dataset
+    versions (and so invalidation) are up to date. `versions` gives the
+    version of a (dataset, local authority ID), as `DatasetVersions.of`.
+    `subscribe` registers a callback for changed (dataset, local authority
+    ID) tuples, see `DatasetVersions`.
+    """
+
+    def __init__(self, app=None, version=None, versions=None, subscribe=None):
+        self.version = version
+        self.versions = versions
+        self.subscribe = subscribe
+        self.cache = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("RESULT_CACHE_ENABLED", True)
+        app.config.setdefault("RESULT_CACHE_SIZE", 32 * 1024 * 1024)
+
+        if not app.config["RESULT_CACHE_ENABLED"]:
+            return
+
+        self.cache = LRUCache(app.config["RESULT_CACHE_SIZE"])
+        self.subscribe(self.invalidate)
+
+    def key(self, name, params, depends):
+        """
+        Cache key for a result.
+
+        `params` should already be normalised (e.g. coordinates rounded), so
+        equivalent requests share an entry. `depends` is an iterable of
+        (dataset, local authority ID) the result includes data from, with an
+        ID of None meaning any local authority.
+        """
+        depends = frozenset(depends)
+        if self.cache is None:
+            return (name, depends, None, None)
+
+        self.version()
+        versions = frozenset(
+            (depend, self.versions(*depend)) for depend in depends
+        )
+        return (name, depends, versions, tuple(sorted(params.items())))
+
+    def get(self, key):
+        if self.cache is None:
+            return None
+
+        return self.cache.get(key)
+
+    def set(self, key, body):
+        if self.cache is not None:
+            self.cache.set(key, body)
+
+    def invalidate(self, changed):
+        """
+        Drop entries which depend on any of the `changed`
+        (dataset, local authority ID) tuples.
+        """
+        datasets = {dataset for dataset, _ in changed}
+
+        def stale(key):
+            return any(
+                (dataset, local_authority_id) in changed
+                or (local_authority_id is None and dataset in datasets)
+                for dataset, local_authority_id in key[1]
+            )
+
+        self.cache.delete_where(stale)
+
+    def stats(self):
+        return self.cache.stats() if self.cache is not None else None
@@ -1,13 +1,19 @@
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 
 from geoalchemy2.elements import WKTElement
 from geoalchemy2.types import Geometry as GeometryType
-from marshmallow import Schema, fields, post_dump, pre_dump, pre_load
+from marshmallow import (
+    Schema,
+    ValidationError,
+    fields,
+    post_dump,
+    pre_dump,
+    pre_load,
+)
 from marshmallow_sqlalchemy.convert import ModelConverter as BaseModelConverter
-from shapely import wkb
 
 from . import ma
-from .models import AADFByDirection, Ward
+from .models import AADF, AADFByDirection, DatasetVersion, RawCount, Ward
 
 
 class ModelConverter(BaseModelConverter):
@@ -24,6 +30,8 @@ class AADFByDirectionSchema(ma.ModelSchema):
 
     @post_dump
     def point_to_string(self, in_data, **kwargs):
+        from shapely import wkb
+
         if in_data["point"] is not None:
             p = wkb.loads(str(in_data["point"]), hex=True)
             in_data["point"] = str(p)
@@ -53,16 +61,19 @@ class AADFByDirectionSchema(ma.ModelSchema):
         # So check for empty string and ensure None is being used.
         decimal_fields = ["link_length_km", "link_length_miles"]
         for field in decimal_fields:
-            if in_data[field] == "":
+            if in_data.get(field) in ("", None):
                 in_data[field] = None
             else:
-                in_data[field] = Decimal(in_data[field])
+                try:
+                    in_data[field] = Decimal(in_data[field])
+                except InvalidOperation:
+                    raise ValidationError("Not a valid number.", field)
 
         return in_data
 
     @pre_load
     def create_point(self, in_data, **kwargs):
-        if in_data["longitude"] and in_data["latitude"]:
+        if in_data.get("longitude") and in_data.get("latitude"):
             in_data[
                 "point"
             ] = f'SRID=4326;POINT({in_data["longitude"]} {in_data["latitude"]})'
@@ -73,6 +84,24 @@ aadf_by_direction_schema = AADFByDirectionSchema()
 list_aadf_by_direction_schema = AADFByDirectionSchema(many=True)
 
 
+class AADFSchema(AADFByDirectionSchema):
+    class Meta(AADFByDirectionSchema.Meta):
+        model = AADF
+
+
+aadf_schema = AADFSchema()
+list_aadf_schema = AADFSchema(many=True)
+
+
+class RawCountSchema(AADFByDirectionSchema):
+    class Meta(AADFByDirectionSchema.Meta):
+        model = RawCount
+
+
+raw_count_schema = RawCountSchema()
+list_raw_count_schema = RawCountSchema(many=True)
+
+
 class YearSchema(Schema):
     year = fields.String()
 
@@ -139,7 +168,9 @@ class WardSchema(ma.ModelSchema):
 
     @post_dump
     def geom_to_string(self, in_data, **kwargs):
-        if in_data["geom"] is not None:
+        from shapely import wkb
+
+        if in_data.get("geom") is not None:
             p = wkb.loads(str(in_data["geom"]), hex=True)
             in_data["geom"] = str(p)
         return in_data
@@ -165,3 +196,40 @@ class WardSchema(ma.ModelSchema):
 
 ward_schema = WardSchema
 list_ward_schema = WardSchema(many=True)
+list_ward_without_geom_schema = WardSchema(many=True, exclude=["geom"])
+
+
+class DatasetVersionSchema(Schema):
+    dataset = fields.String()
+    local_authority_id = fields.Int()
+    version = fields.Int()
+    modified_at = fields.DateTime()
+
+
+dataset_version_schema = DatasetVersionSchema
+list_dataset_version_schema = DatasetVersionSchema(many=True)
+
+
+class ImportJobSchema(Schema):
+    id = fields.Int()
+    dataset = fields.String()
+    local_authority_id = fields.Int()
+    status = fields.String()
+    attempts = fields.Int()
+    max_attempts = fields.Int()
+    error = fields.String()
+    rows_parsed = fields.Int()
+    rows_inserted = fields.Int()
+    rows_rejected = fields.Int()
+    rejects_path = fields.String()
+    rows_per_second = fields.Float()
+    worker = fields.String()
+    created_at = fields.DateTime()
+    run_after = fields.DateTime()
+    started_at = fields.DateTime()
+    finished_at = fields.DateTime()
+    heartbeat_at = fields.DateTime()
+
+
+import_job_schema = ImportJobSchema()
+list_import_job_schema = ImportJobSchema(many=True)
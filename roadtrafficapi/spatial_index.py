@@ -0,0 +1,321 @@
+"""
+In memory spatial index of count points.
+
+There's only a few tens of thousands of count points, so rather than asking
+PostGIS to work out which are near a point on every request, keep a grid index
+of them in a memory mapped file. All gunicorn workers map the same file, so
+share a single copy via the OS page cache.
+
+The grid is over British National Grid eastings/northings (which are already
+in metres, so no trig needed to find candidate cells). Candidates are then
+checked against their longitude/latitude using the same spherical distance as
+PostGIS' `ST_Distance_Sphere`, so results match the database.
+
+File layout (all little endian):
+
+  * Header (see `HEADER`), padded to 48 bytes.
+  * Eastings, northings, longitudes, latitudes: `count` doubles each, sorted by
+    grid cell.
+  * Cell starts: `cols * rows + 1` unsigned ints. Points in cell `i` are at
+    indexes `cell_starts[i]` to `cell_starts[i + 1]`.
+  * Count point IDs: `count` ints.
+"""
+
+import heapq
+import mmap
+import os
+import struct
+import threading
+from math import asin, cos, radians, sin, sqrt
+
+from .geo import lonlat_to_bng
+
+MAGIC = b"RTASIX01"
+
+# magic, count, cell size, min easting, min northing, cols, rows
+HEADER = struct.Struct("<8sIdddII")
+HEADER_SIZE = 48
+
+# Radius of the sphere used by PostGIS' ST_Distance_Sphere
+EARTH_RADIUS = 6370986
+
+# Converting longitude/latitude to eastings/northings here skips the datum
+# shift, so allow for it (plus a little for the grid's scale factor) when
+# looking for candidates.
+MARGIN = 200
+SCALE_MARGIN = 0.002
+
+
+def sphere_distance(lon1, lat1, lon2, lat2):
+    lon1, lat1, lon2, lat2 = map(radians, (lon1, lat1, lon2, lat2))
+    a = (
+        sin((lat2 - lat1) / 2) ** 2
+        + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * asin(sqrt(a))
+
+
+def write_index(path, points, cell_size=1000):
+    """
+    Write an index of `points`, an iterable of
+    (count point ID, easting, northing, longitude, latitude) tuples.
+
+    Written to a temporary file then moved into place, so anything reading
+    the old index carries on undisturbed.
+    """
+    points = list(points)
+
+    if points:
+        min_e = min(p[1] for p in points)
+        min_n = min(p[2] for p in points)
+        cols = int((max(p[1] for p in points) - min_e) // cell_size) + 1
+        rows = int((max(p[2] for p in points) - min_n) // cell_size) + 1
+    else:
+        min_e = min_n = 0
+        cols = rows = 1
+
+    def cell(point):
+        col = int((point[1] - min_e) // cell_size)
+        row = int((point[2] - min_n) // cell_size)
+        return row * cols + col
+
+    points.sort(key=cell)
+
+    cell_starts = [0] * (cols * rows + 1)
+    for point in points:
+        cell_starts[cell(point) + 1] += 1
+    for i in range(1, len(cell_starts)):
+        cell_starts[i] += cell_starts[i - 1]
+
+    count = len(points)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, count, cell_size, min_e, min_n, cols, rows))
+        f.write(b"\0" * (HEADER_SIZE - HEADER.size))
+        for i in (1, 2, 3, 4):
+            f.write(struct.pack(f"<{count}d", *(p[i] for p in points)))
+        f.write(struct.pack(f"<{len(cell_starts)}I", *cell_starts))
+        f.write(struct.pack(f"<{count}i", *(p[0] for p in points)))
+
+    os.replace(tmp_path, path)
+
+
+class IndexFile:
+    """
+    A single memory mapped index file.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        buf = memoryview(self._mmap)
+        (
+            magic,
+            self.count,
+            self.cell_size,
+            self.min_e,
+            self.min_n,
+            self.cols,
+            self.rows,
+        ) = HEADER.unpack_from(buf)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a spatial index")
+
+        offset = HEADER_SIZE
+
+        def array(fmt, length):
+            nonlocal offset
+            size = struct.calcsize(fmt) * length
+            view = buf[offset : offset + size].cast(fmt)
+            offset += size
+            return view
+
+        self.eastings = array("d", self.count)
+        self.northings = array("d", self.count)
+        self.longitudes = array("d", self.count)
+        self.latitudes = array("d", self.count)
+        self.cell_starts = array("I", self.cols * self.rows + 1)
+        self.ids = array("i", self.count)
+
+    def cells(self, min_e, min_n, max_e, max_n):
+        """
+        Ranges of point indexes within cells overlapping a box.
+        """
+        first_col = max(0, int((min_e - self.min_e) // self.cell_size))
+        last_col = min(
+            self.cols - 1, int((max_e - self.min_e) // self.cell_size)
+        )
+        first_row = max(0, int((min_n - self.min_n) // self.cell_size))
+        last_row = min(
+            self.rows - 1, int((max_n - self.min_n) // self.cell_size)
+        )
+
+        for row in range(first_row, last_row + 1):
+            # Cells in a row are contiguous, so can take them all at once
+            start = self.cell_starts[row * self.cols + first_col]
+            end = self.cell_starts[row * self.cols + last_col + 1]
+            if start != end:
+                yield range(start, end)
+
+
+class SpatialIndex:
+    """
+    Query count points near a location, without touching the database.
+
+    Disabled unless `SPATIAL_INDEX_PATH` is configured and the index has been
+    built (see `rebuild`).
+    """
+
+    def __init__(self, app=None):
+        self.path = None
+        self._index = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("SPATIAL_INDEX_PATH", None)
+        app.config.setdefault("SPATIAL_INDEX_CELL_SIZE", 1000)
+        self.path = app.config["SPATIAL_INDEX_PATH"]
+        self.cell_size = app.config["SPATIAL_INDEX_CELL_SIZE"]
+
+    @property
+    def enabled(self):
+        return self.path is not None and os.path.exists(self.path)
+
+    def rebuild(self):
+        """
+        Rebuild the index from the database.
+        """
+        from . import db
+        from .models import AADFByDirection
+
+        q = (
+            db.session.query(
+                AADFByDirection.count_point_id,
+                AADFByDirection.easting,
+                AADFByDirection.northing,
+                AADFByDirection.longitude,
+                AADFByDirection.latitude,
+            )
+            .distinct(AADFByDirection.count_point_id)
+            .order_by(AADFByDirection.count_point_id)
+        )
+        write_index(self.path, q, cell_size=self.cell_size)
+
+    @property
+    def index(self):
+        """
+        The current index file, reopened if it's been rebuilt since it was
+        last used.
+        """
+        stat = os.stat(self.path)
+        index = self._index
+        if index is None or (index.stat.st_ino, index.stat.st_mtime_ns) != (
+            stat.st_ino,
+            stat.st_mtime_ns,
+        ):
+            with self._lock:
+                index = self._index = IndexFile(self.path)
+        return index
+
+    def _candidates(self, index, min_e, min_n, max_e, max_n):
+        for indexes in index.cells(min_e, min_n, max_e, max_n):
+            for i in indexes:
+                yield i
+
+    def radius(self, longitude, latitude, distance):
+        """
+        IDs of count points within `distance` metres of a point.
+        """
+        index = self.index
+        e, n = lonlat_to_bng(longitude, latitude)
+        margin = distance * (1 + SCALE_MARGIN) + MARGIN
+
+        return [
+            index.ids[i]
+            for i in self._candidates(
+                index, e - margin, n - margin, e + margin, n + margin
+            )
+            if sphere_distance(
+                longitude, latitude, index.longitudes[i], index.latitudes[i],
+            )
+            <= distance
+        ]
+
+    def bbox(self, min_longitude, min_latitude, max_longitude, max_latitude):
+        """
+        IDs of count points within a longitude/latitude bounding box.
+        """
+        index = self.index
+        corners = [
+            lonlat_to_bng(lon, lat)
+            for lon in (min_longitude, max_longitude)
+            for lat in (min_latitude, max_latitude)
+        ]
+        eastings = [e for e, _ in corners]
+        northings = [n for _, n in corners]
+
+        # Lines of longitude curve on the grid, so widen the box a bit more
+        # than just the datum shift.
+        margin = MARGIN + (max(northings) - min(northings)) * 0.05
+
+        return [
+            index.ids[i]
+            for i in self._candidates(
+                index,
+                min(eastings) - margin,
+                min(northings) - margin,
+                max(eastings) + margin,
+                max(northings) + margin,
+            )
+            if min_longitude <= index.longitudes[i] <= max_longitude
+            and min_latitude <= index.latitudes[i] <= max_latitude
+        ]
+
+    def nearest(self, longitude, latitude, k=1):
+        """
+        (distance, count point ID) tuples of the `k` nearest count points,
+        closest first.
+        """
+        index = self.index
+        e, n = lonlat_to_bng(longitude, latitude)
+
+        nearest = []
+        seen = set()
+        ring = 0
+        while True:
+            # Search an ever expanding square of cells around the point,
+            # skipping the ones already searched.
+            for indexes in index.cells(
+                e - (ring + 1) * index.cell_size,
+                n - (ring + 1) * index.cell_size,
+                e + (ring + 1) * index.cell_size,
+                n + (ring + 1) * index.cell_size,
+            ):
+                for i in indexes:
+                    if i in seen:
+                        continue
+                    seen.add(i)
+                    distance = sphere_distance(
+                        longitude,
+                        latitude,
+                        index.longitudes[i],
+                        index.latitudes[i],
+                    )
+                    nearest.append((distance, index.ids[i]))
+
+            # Anything not yet found is outside the square just searched, so
+            # once there's enough closer than that, we're done.
+            nearest = heapq.nsmallest(k, nearest)
+            if len(nearest) == k and nearest[-1][0] <= (
+                (ring + 1) * index.cell_size - MARGIN
+            ):
+                break
+            if len(seen) == index.count:
+                break
+            ring += 1
+
+        return nearest
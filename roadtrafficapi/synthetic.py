@@ -0,0 +1,360 @@
+"""
+Generate synthetic, but plausible, AADF By Direction and Ward data.
+
+Handy for testing how things behave with far more data than is sensible to
+download from DfT. Output is written in the same formats as the real data, so
+loads through the normal import paths:
+
+  * One AADF By Direction CSV per local authority, named as per DfT's files.
+  * A `wards.geojson` file, with the same properties as the ONS wards.
+"""
+
+import csv
+import json
+import os
+import random
+from math import log
+
+from .geo import bng_to_lonlat
+
+# Columns, in the order DfT publishes them in
+AADF_BY_DIRECTION_FIELDS = [
+    "count_point_id",
+    "direction_of_travel",
+    "year",
+    "region_id",
+    "region_name",
+    "local_authority_id",
+    "local_authority_name",
+    "road_name",
+    "road_type",
+    "start_junction_road_name",
+    "end_junction_road_name",
+    "easting",
+    "northing",
+    "latitude",
+    "longitude",
+    "link_length_km",
+    "link_length_miles",
+    "estimation_method",
+    "estimation_method_detailed",
+    "pedal_cycles",
+    "two_wheeled_motor_vehicles",
+    "cars_and_taxis",
+    "buses_and_coaches",
+    "lgvs",
+    "hgvs_2_rigid_axle",
+    "hgvs_3_rigid_axle",
+    "hgvs_3_or_4_articulated_axle",
+    "hgvs_4_or_more_rigid_axle",
+    "hgvs_5_articulated_axle",
+    "hgvs_6_articulated_axle",
+    "all_hgvs",
+    "all_motor_vehicles",
+]
+
+HGV_FIELDS = [
+    "hgvs_2_rigid_axle",
+    "hgvs_3_rigid_axle",
+    "hgvs_3_or_4_articulated_axle",
+    "hgvs_4_or_more_rigid_axle",
+    "hgvs_5_articulated_axle",
+    "hgvs_6_articulated_axle",
+]
+
+# Rough split of HGVs between the axle classes, in the same order as
+# HGV_FIELDS
+HGV_SPLIT = [0.4, 0.08, 0.07, 0.1, 0.1, 0.25]
+
+# Towns/cities to scatter local authorities around, so count points end up
+# somewhere resembling land: (name, easting, northing, region id, region name)
+ANCHORS = [
+    ("London", 530000, 180000, 6, "London"),
+    ("Birmingham", 407000, 287000, 10, "West Midlands"),
+    ("Manchester", 384000, 398000, 5, "North West"),
+    ("Liverpool", 334000, 390000, 5, "North West"),
+    ("Leeds", 430000, 433000, 8, "Yorkshire and the Humber"),
+    ("Sheffield", 435000, 387000, 8, "Yorkshire and the Humber"),
+    ("Newcastle", 425000, 564000, 11, "North East"),
+    ("Nottingham", 457000, 340000, 2, "East Midlands"),
+    ("Norwich", 623000, 308000, 7, "East of England"),
+    ("Cambridge", 545000, 258000, 7, "East of England"),
+    ("Oxford", 451000, 206000, 9, "South East"),
+    ("Southampton", 442000, 112000, 9, "South East"),
+    ("Bristol", 359000, 173000, 1, "South West"),
+    ("Exeter", 292000, 92000, 1, "South West"),
+    ("Plymouth", 248000, 55000, 1, "South West"),
+    ("Cardiff", 318000, 176000, 4, "Wales"),
+    ("Swansea", 265000, 193000, 4, "Wales"),
+    ("Glasgow", 259000, 665000, 3, "Scotland"),
+    ("Edinburgh", 325000, 673000, 3, "Scotland"),
+    ("Aberdeen", 394000, 806000, 3, "Scotland"),
+]
+
+DIRECTION_PAIRS = [("N", "S"), ("E", "W")]
+
+ESTIMATION_METHODS = [
+    ("Counted", "Manual count"),
+    ("Estimated", "Estimated using previous year's AADF on this link"),
+    ("Estimated", "Dependent on a nearby count point"),
+]
+
+# How spread out count points are around the centre of their local authority,
+# in metres.
+COUNT_POINT_SPREAD = 6000
+
+WARD_SIZE = 4000
+
+
+def generate(
+    output_dir,
+    local_authorities=10,
+    count_points=200,
+    years=range(2000, 2019),
+    first_local_authority_id=9000,
+    seed=None,
+):
+    """
+    Write synthetic AADF By Direction CSVs and matching wards to `output_dir`.
+
+    Returns a list of the paths of the generated AADF By Direction CSVs.
+    """
+    rng = random.Random(seed)
+    years = list(years)
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    paths = []
+    wards = []
+    next_count_point_id = first_local_authority_id * 1000
+
+    for i in range(local_authorities):
+        authority = generate_local_authority(rng, first_local_authority_id + i)
+
+        count_point_ids = range(
+            next_count_point_id, next_count_point_id + count_points
+        )
+        next_count_point_id += count_points
+
+        path = os.path.join(
+            output_dir,
+            "dft_aadfbydirection_local_authority_id_"
+            f"{authority['local_authority_id']}.csv",
+        )
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=AADF_BY_DIRECTION_FIELDS)
+            writer.writeheader()
+            for count_point_id in count_point_ids:
+                writer.writerows(
+                    generate_count_point_rows(
+                        rng, authority, count_point_id, years
+                    )
+                )
+        paths.append(path)
+
+        wards.extend(generate_wards(authority, first_id=len(wards) + 1))
+
+    write_wards_geojson(os.path.join(output_dir, "wards.geojson"), wards)
+
+    return paths
+
+
+def generate_local_authority(rng, local_authority_id):
+    anchor, easting, northing, region_id, region_name = rng.choice(ANCHORS)
+    return {
+        "local_authority_id": local_authority_id,
+        "local_authority_name": f"Synthetic {anchor} {local_authority_id}",
+        "region_id": region_id,
+        "region_name": region_name,
+        "easting": int(rng.gauss(easting, 5000)),
+        "northing": int(rng.gauss(northing, 5000)),
+    }
+
+
+def _extent(authority):
+    """
+    Bounding box (min easting, min northing, max easting, max northing) which
+    all of a local authority's count points and wards sit within.
+    """
+    half = 3 * COUNT_POINT_SPREAD
+    return (
+        authority["easting"] - half,
+        authority["northing"] - half,
+        authority["easting"] + half,
+        authority["northing"] + half,
+    )
+
+
+def _sample_location(rng, authority):
+    """
+    Pick a random easting/northing near the centre of a local authority,
+    making sure it falls within one of the authority's wards.
+    """
+    min_e, min_n, max_e, max_n = _extent(authority)
+    while True:
+        easting = int(rng.gauss(authority["easting"], COUNT_POINT_SPREAD))
+        northing = int(rng.gauss(authority["northing"], COUNT_POINT_SPREAD))
+        if min_e <= easting < max_e and min_n <= northing < max_n:
+            return easting, northing
+
+
+def generate_count_point_rows(rng, authority, count_point_id, years):
+    """
+    Generate every year and direction for a single count point.
+
+    Vehicle class counts are correlated: each count point has a base flow and
+    a mix of vehicles which drift a little year on year, rather than every
+    class being picked independently.
+    """
+    easting, northing = _sample_location(rng, authority)
+    longitude, latitude = bng_to_lonlat(easting, northing)
+
+    if rng.random() < 0.3:
+        road_type = "Major"
+        road_name = rng.choice(["M", "A"]) + str(rng.randint(1, 999))
+        base_flow = rng.lognormvariate(log(15000), 0.6)
+        hgv_share = rng.uniform(0.04, 0.15)
+        pedal_cycle_share = rng.uniform(0, 0.005)
+    else:
+        road_type = "Minor"
+        road_name = rng.choice(["B", "C", "U"]) + str(rng.randint(1, 9999))
+        base_flow = rng.lognormvariate(log(1500), 0.8)
+        hgv_share = rng.uniform(0.005, 0.04)
+        pedal_cycle_share = rng.uniform(0, 0.05)
+
+    bus_share = rng.uniform(0.002, 0.02)
+    two_wheeled_share = rng.uniform(0.003, 0.012)
+    lgv_share = rng.uniform(0.1, 0.2)
+
+    link_length_km = round(rng.uniform(0.1, 8), 1)
+    link_length_miles = round(link_length_km * 0.621371, 1)
+
+    first_year = years[0] if years else 0
+    rows = []
+    for year in years:
+        # Gentle growth over time, plus a bit of noise between years
+        growth = (1.01 ** (year - first_year)) * rng.gauss(1, 0.05)
+        estimation_method, estimation_method_detailed = rng.choice(
+            ESTIMATION_METHODS
+        )
+
+        for direction in rng.choice(DIRECTION_PAIRS):
+            # Flows are rarely perfectly balanced between directions
+            flow = max(1, base_flow * growth * rng.gauss(1, 0.05))
+
+            hgvs = [
+                int(flow * hgv_share * split * rng.gauss(1, 0.1))
+                for split in HGV_SPLIT
+            ]
+            hgvs = [max(0, hgv) for hgv in hgvs]
+            buses = max(0, int(flow * bus_share))
+            two_wheeled = max(0, int(flow * two_wheeled_share))
+            lgvs = max(0, int(flow * lgv_share))
+            cars = max(0, int(flow) - sum(hgvs) - buses - two_wheeled - lgvs)
+
+            row = {
+                "count_point_id": count_point_id,
+                "direction_of_travel": direction,
+                "year": year,
+                "region_id": authority["region_id"],
+                "region_name": authority["region_name"],
+                "local_authority_id": authority["local_authority_id"],
+                "local_authority_name": authority["local_authority_name"],
+                "road_name": road_name,
+                "road_type": road_type,
+                "start_junction_road_name": "",
+                "end_junction_road_name": "",
+                "easting": easting,
+                "northing": northing,
+                "latitude": round(latitude, 6),
+                "longitude": round(longitude, 6),
+                "link_length_km": link_length_km,
+                "link_length_miles": link_length_miles,
+                "estimation_method": estimation_method,
+                "estimation_method_detailed": estimation_method_detailed,
+                "pedal_cycles": int(flow * pedal_cycle_share),
+                "two_wheeled_motor_vehicles": two_wheeled,
+                "cars_and_taxis": cars,
+                "buses_and_coaches": buses,
+                "lgvs": lgvs,
+                "all_hgvs": sum(hgvs),
+                "all_motor_vehicles": cars
+                + sum(hgvs)
+                + buses
+                + two_wheeled
+                + lgvs,
+            }
+            row.update(zip(HGV_FIELDS, hgvs))
+            rows.append(row)
+
+    return rows
+
+
+def generate_wards(authority, first_id):
+    """
+    Split a local authority's extent into a grid of square wards.
+    """
+    min_e, min_n, max_e, max_n = _extent(authority)
+    authority_id = authority["local_authority_id"]
+
+    wards = []
+    ward_id = first_id
+    for e in range(min_e, max_e, WARD_SIZE):
+        for n in range(min_n, max_n, WARD_SIZE):
+            corners = [
+                bng_to_lonlat(x, y)
+                for x, y in [
+                    (e, n),
+                    (e + WARD_SIZE, n),
+                    (e + WARD_SIZE, n + WARD_SIZE),
+                    (e, n + WARD_SIZE),
+                    (e, n),
+                ]
+            ]
+            centre_e = e + WARD_SIZE // 2
+            centre_n = n + WARD_SIZE // 2
+            longitude, latitude = bng_to_lonlat(centre_e, centre_n)
+            wards.append(
+                {
+                    "objectid": ward_id,
+                    "wd16cd": f"X05{ward_id:06d}",
+                    "wd16nm": f"Synthetic Ward {ward_id}",
+                    "wd16nmw": "",
+                    "lad16cd": f"X06{authority_id:06d}",
+                    "lad16nm": authority["local_authority_name"],
+                    "bng_e": centre_e,
+                    "bng_n": centre_n,
+                    "long": round(longitude, 6),
+                    "lat": round(latitude, 6),
+                    "st_areasha": WARD_SIZE * WARD_SIZE,
+                    "st_lengths": WARD_SIZE * 4,
+                    "geometry": [
+                        [round(x, 6), round(y, 6)] for x, y in corners
+                    ],
+                }
+            )
+            ward_id += 1
+
+    return wards
+
+
+def write_wards_geojson(path, wards):
+    """
+    Write wards as a GeoJSON FeatureCollection, for `flask import-wards`.
+    """
+    features = []
+    for ward in wards:
+        properties = {k: v for k, v in ward.items() if k != "geometry"}
+        features.append(
+            {
+                "type": "Feature",
+                "properties": properties,
+                "geometry": {
+                    "type": "MultiPolygon",
+                    "coordinates": [[ward["geometry"]]],
+                },
+            }
+        )
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f)
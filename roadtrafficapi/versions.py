@@ -0,0 +1,202 @@
+"""
+Dataset versions, so caches in each gunicorn worker know when to let go.
+
+Every import bumps the version of the local authority it touched (see
+`bump_dataset_version`). Each worker keeps its own copy of all versions,
+refreshed either by polling the `dataset_versions` table every few seconds, or
+straight away when told to by PostgreSQL's LISTEN/NOTIFY.
+"""
+
+import logging
+import os
+import select
+import threading
+import time
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL NOTIFY channel used to announce imports
+CHANNEL = "dataset_versions"
+
+
+def bump_dataset_version(dataset, local_authority_id, session):
+    """
+    Adds bumping the version of a local authority's data to the session.
+
+    Also sends a notification to any listening workers. Notifications are only
+    delivered once the transaction commits, so workers never see a version
+    before the data that goes with it.
+    """
+    from .models import DatasetVersion
+
+    table = DatasetVersion.__table__
+    q = insert(table).values(
+        dataset=dataset, local_authority_id=local_authority_id, version=1
+    )
+    q = q.on_conflict_do_update(
+        index_elements=[table.c.dataset, table.c.local_authority_id],
+        set_={"version": table.c.version + 1, "modified_at": func.now()},
+    )
+    session.execute(q)
+    session.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": CHANNEL, "payload": f"{dataset}:{local_authority_id}"},
+    )
+
+
+class DatasetVersions:
+    """
+    Per process copy of the `dataset_versions` table.
+
+    Other parts of the app can `subscribe` to be told which local authorities
+    have changed, e.g. to drop just the affected cache entries.
+    """
+
+    def __init__(self, app=None):
+        self.versions = {}
+        self.version = None
+        self.last_modified = None
+        self._listeners = []
+        self._last_refresh = None
+        self._stale = True
+        self._lock = threading.Lock()
+        self._listener_pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("DATASET_VERSION_POLL_INTERVAL", 5)
+        app.config.setdefault("DATASET_VERSION_LISTEN", False)
+        self.app = app
+
+    def subscribe(self, callback):
+        """
+        Register `callback` to be called with a set of changed
+        (dataset, local authority ID) tuples whenever versions change.
+        """
+        self._listeners.append(callback)
+
+    def current(self):
+        """
+        Overall version of all data, refreshing if it might be out of date.
+        """
+        if self.app.config["DATASET_VERSION_LISTEN"]:
+            self._ensure_listening()
+        elif (
+            self._last_refresh is None
+            or time.monotonic() - self._last_refresh
+            > self.app.config["DATASET_VERSION_POLL_INTERVAL"]
+        ):
+            self._stale = True
+
+        if self._stale:
+            self.refresh()
+
+        return self.version
+
+    def of(self, dataset, local_authority_id=None):
+        """
+        Version of a local authority's data within a dataset, or of the whole
+        dataset if `local_authority_id` is None. 0 if it's never been
+        imported.
+
+        Doesn't refresh, see `current`.
+        """
+        versions = self.versions
+        if local_authority_id is not None:
+            version = versions.get((dataset, local_authority_id))
+            return version[0] if version is not None else 0
+
+        # Like the overall version, sums only ever go up
+        return sum(
+            version
+            for (name, _), (version, _) in versions.items()
+            if name == dataset
+        )
+
+    def refresh(self):
+        from . import db
+        from .models import DatasetVersion
+
+        with self._lock:
+            self._stale = False
+            self._last_refresh = time.monotonic()
+
+            # Always from the primary, even during read only requests (see
+            # `RoutingSession`). A lagging replica would hand back versions
+            # from before a NOTIFY, which would then be taken as up to date,
+            # and different replicas could even make versions go backwards.
+            table = DatasetVersion.__table__
+            with db.engine.connect() as connection:
+                rows = connection.execute(table.select()).fetchall()
+            versions = {
+                (row.dataset, row.local_authority_id): (
+                    row.version,
+                    row.modified_at,
+                )
+                for row in rows
+            }
+
+            changed = {
+                key
+                for key in versions.keys() | self.versions.keys()
+                if versions.get(key) != self.versions.get(key)
+            }
+            first_refresh = self.version is None
+
+            self.versions = versions
+            # Versions only ever go up, so the sum makes a handy overall
+            # version which changes whenever any local authority does.
+            self.version = sum(version for version, _ in versions.values())
+            self.last_modified = max(
+                (modified_at for _, modified_at in versions.values()),
+                default=None,
+            )
+
+        if changed and not first_refresh:
+            for callback in self._listeners:
+                callback(changed)
+
+    def _ensure_listening(self):
+        # Workers are forked from the gunicorn master, so each process needs
+        # its own listening connection.
+        if self._listener_pid == os.getpid():
+            return
+
+        self._listener_pid = os.getpid()
+        self._stale = True
+
+        from . import db
+
+        connection = db.engine.raw_connection()
+        # Keep the connection away from the pool, it's going to be tied up
+        # waiting for notifications forever.
+        connection.detach()
+        thread = threading.Thread(
+            target=self._listen, args=(connection.connection,), daemon=True
+        )
+        thread.start()
+
+    def _listen(self, connection):
+        try:
+            connection.set_session(autocommit=True)
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+
+            while True:
+                if select.select([connection], [], [], 60) == ([], [], []):
+                    continue
+                connection.poll()
+                if connection.notifies:
+                    logger.debug("Dataset changed: %s", connection.notifies)
+                    del connection.notifies[:]
+                    self._stale = True
+        except Exception:
+            # Lost the connection. Refresh and start listening again on the
+            # next request, rather than silently serving stale data forever.
+            logger.exception("Stopped listening for dataset changes")
+            self._listener_pid = None
+            self._stale = True
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Check how long it takes to import the app, against a budget.
+
+Every gunicorn worker and every CLI command (`flask db upgrade`, imports etc)
+pays this cost, so it's worth noticing when it creeps up.
+
+Runs a fresh interpreter several times, using `-X importtime`, and takes the
+fastest run to keep noise down. Exits non-zero if over budget.
+
+    $ python scripts/check_import_time.py --budget 1500
+"""
+
+import argparse
+import subprocess
+import sys
+
+
+def measure(module):
+    """
+    Import `module` in a fresh interpreter.
+
+    Returns the total time in microseconds, and a list of
+    (self time, cumulative time, module name) tuples.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        stderr=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        universal_newlines=True,
+        check=True,
+    )
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        timings.append((int(self_us), int(cumulative_us), name.strip()))
+
+    total = next(
+        cumulative for _, cumulative, name in timings if name == module
+    )
+    return total, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="roadtrafficapi.main")
+    parser.add_argument(
+        "--budget", type=float, default=1500, help="Budget in milliseconds."
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    total, timings = min(
+        (measure(args.module) for _ in range(args.runs)), key=lambda r: r[0]
+    )
+
+    print(f"Slowest imports (self time) for {args.module}:")
+    for self_us, cumulative_us, name in sorted(timings, reverse=True)[
+        : args.top
+    ]:
+        print(
+            f"  {self_us / 1000:8.1f}ms {cumulative_us / 1000:8.1f}ms  {name}"
+        )
+
+    print(f"Total: {total / 1000:.1f}ms (budget {args.budget:.0f}ms)")
+
+    if total / 1000 > args.budget:
+        print("Over budget!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()